@@ -0,0 +1,70 @@
+import argparse
+import json
+import logging
+from app.database import SessionLocal, engine
+from app.models import Base
+from app.migrations import aplicar_migracoes
+from app.services.estatisticas import reconstruir_estatisticas
+from app.services.engajamento import recalcular_engajamento
+from app.services.revalidacao import TAMANHO_LOTE_REVALIDACAO, revalidar_documentos
+
+# Comandos de manutenção. Uso: python -m app.cli <comando>
+
+def comando_migrar(args):
+    Base.metadata.create_all(bind=engine)
+    aplicar_migracoes()
+
+def comando_reconstruir_estatisticas(args):
+    db = SessionLocal()
+    try:
+        recalcular_engajamento(db)
+        reconstruir_estatisticas(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def comando_revalidar_documentos(args):
+    db = SessionLocal()
+    try:
+        resumo = revalidar_documentos(
+            db,
+            processos=args.processos,
+            tamanho_lote=args.tamanho_lote,
+            simular=args.simular
+        )
+    finally:
+        db.close()
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Comandos de manutenção do Projeto Furia")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    migrar = subparsers.add_parser("migrar", help="Cria as tabelas e aplica as migrações pendentes")
+    migrar.set_defaults(func=comando_migrar)
+
+    reconstruir = subparsers.add_parser(
+        "reconstruir-estatisticas",
+        help="Recalcula do zero o engajamento dos fãs e os contadores usados por /dashboard/stats"
+    )
+    reconstruir.set_defaults(func=comando_reconstruir_estatisticas)
+
+    revalidar = subparsers.add_parser(
+        "revalidar-documentos",
+        help="Aplica novamente a validação de nome aos documentos já gravados e atualiza o campo validado"
+    )
+    revalidar.add_argument("--processos", type=int, default=None, help="Processos usados na validação (padrão: um por CPU)")
+    revalidar.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE_REVALIDACAO, help="Documentos lidos e atualizados por vez")
+    revalidar.add_argument("--simular", action="store_true", help="Só calcula as mudanças, sem gravar")
+    revalidar.set_defaults(func=comando_revalidar_documentos)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,51 @@
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routes import cadastro, upload, redes, dashboard
+from app.routes import cadastro, upload, redes, dashboard, exportacao
 from app.models import Base
 from app.database import engine
 from app.middleware.upload_validator import FileUploadMiddleware
+from app.routes.upload import MAX_ARQUIVOS_LOTE, UPLOAD_MAX_BYTES_DOCUMENTO
+from app.migrations import aplicar_migracoes
+from app.services.ocr import encerrar_executor_ocr
+from app.services.fila_documentos import fila_documentos
+from app.services.ai_validator import pool_drivers
+from app.routes.redes import executor_redes
 
 # Criar tabelas no banco de dados
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Projeto Furia")
+# Aplicar migrações de dados pendentes
+aplicar_migracoes()
 
-UPLOAD_SIZE_LIMIT = 1024 * 1024 * 2
-UPLOAD_ROUTES = ["/upload"]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers da fila de documentos (uploads assíncronos)
+    fila_documentos.iniciar()
+    # Abre os navegadores do Selenium em segundo plano, sem atrasar a subida da API
+    threading.Thread(target=pool_drivers.aquecer, name="aquecer-navegadores", daemon=True).start()
+    yield
+    executor_redes.shutdown(wait=False, cancel_futures=True)
+    pool_drivers.encerrar()
+    # Parar a fila antes de encerrar os processos de OCR que ela usa
+    fila_documentos.parar()
+    encerrar_executor_ocr()
 
-app.middleware("http")(
-    FileUploadMiddleware(
-        max_size=UPLOAD_SIZE_LIMIT,
-        upload_routes=UPLOAD_ROUTES
-    )
+app = FastAPI(title="Projeto Furia", lifespan=lifespan)
+
+# Limite do corpo por rota (regex do caminho, bytes); a primeira que casar vale
+LIMITES_UPLOAD = [
+    (r"^/upload/\d+/batch$", UPLOAD_MAX_BYTES_DOCUMENTO * MAX_ARQUIVOS_LOTE),
+    (r"^/upload/", UPLOAD_MAX_BYTES_DOCUMENTO),
+    (r"^/cadastro/importar$", 1024 * 1024 * 100),
+]
+# Rotas em que o conteúdo dos arquivos enviados é conferido pelos primeiros bytes
+ROTAS_VERIFICAR_TIPO = [r"^/upload/"]
+
+app.add_middleware(
+    FileUploadMiddleware,
+    limites=LIMITES_UPLOAD,
+    verificar_tipo=ROTAS_VERIFICAR_TIPO
 )
 
 # Incluir routers
@@ -24,6 +53,7 @@ app.include_router(cadastro.router)
 app.include_router(upload.router)
 app.include_router(redes.router)
 app.include_router(dashboard.router)
+app.include_router(exportacao.router)
 
 if __name__ == "__main__":
     import uvicorn
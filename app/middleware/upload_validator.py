@@ -1,39 +1,173 @@
-from fastapi import Request, HTTPException
-from typing import List, Callable
 import logging
+import re
+from typing import List, Optional, Tuple
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Assinaturas (primeiros bytes) dos tipos aceitos nos uploads de documentos
+ASSINATURAS_ARQUIVOS = {
+    "image/jpeg": b"\xff\xd8\xff",
+    "image/png": b"\x89PNG\r\n\x1a\n",
+    "application/pdf": b"%PDF-",
+}
+BYTES_ASSINATURA = max(len(assinatura) for assinatura in ASSINATURAS_ARQUIVOS.values())
+
+# Cabeçalhos de uma parte do multipart maiores que isso são tratados como inválidos
+MAX_CABECALHO_PARTE = 16 * 1024
+
+class CorpoRejeitado(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def tipo_pela_assinatura(inicio: bytes) -> Optional[str]:
+    for tipo, assinatura in ASSINATURAS_ARQUIVOS.items():
+        if inicio.startswith(assinatura):
+            return tipo
+    return None
+
+def boundary_multipart(content_type: str) -> Optional[bytes]:
+    encontrado = re.search(r'boundary="?([^";]+)"?', content_type or "")
+    return encontrado.group(1).encode("latin-1") if encontrado else None
+
+class InspetorMultipart:
+    # Lê o corpo multipart à medida que chega e confere os primeiros bytes de cada arquivo
+    def __init__(self, boundary: bytes):
+        self.delimitador = b"--" + boundary
+        self.pendente = b""
+        self.estado = "procurando"
+        self.tipo_declarado = None
+
+    def alimentar(self, pedaco: bytes, fim: bool = False):
+        self.pendente += pedaco
+        while True:
+            if self.estado == "procurando":
+                posicao = self.pendente.find(self.delimitador)
+                if posicao < 0:
+                    self.pendente = self.pendente[-len(self.delimitador):]
+                    return
+                self.pendente = self.pendente[posicao + len(self.delimitador):]
+                self.estado = "cabecalho"
+
+            elif self.estado == "cabecalho":
+                posicao = self.pendente.find(b"\r\n\r\n")
+                if posicao < 0:
+                    if len(self.pendente) > MAX_CABECALHO_PARTE:
+                        raise CorpoRejeitado(400, "Corpo multipart inválido")
+                    return
+                cabecalho = self.pendente[:posicao].decode("latin-1").lower()
+                self.pendente = self.pendente[posicao + 4:]
+                if "filename=" in cabecalho:
+                    tipo = re.search(r"content-type:\s*([^\s;]+)", cabecalho)
+                    self.tipo_declarado = tipo.group(1) if tipo else None
+                    self.estado = "conteudo"
+                else:
+                    self.estado = "procurando"
+
+            elif self.estado == "conteudo":
+                if len(self.pendente) < BYTES_ASSINATURA and not fim:
+                    return
+                self.verificar(self.pendente[:BYTES_ASSINATURA])
+                self.estado = "procurando"
+
+    def verificar(self, inicio: bytes):
+        tipo = tipo_pela_assinatura(inicio)
+        if tipo is None:
+            raise CorpoRejeitado(415, f"Conteúdo do arquivo não corresponde a nenhum tipo permitido: {', '.join(ASSINATURAS_ARQUIVOS)}")
+        if self.tipo_declarado and self.tipo_declarado != tipo:
+            raise CorpoRejeitado(415, f"Arquivo declarado como {self.tipo_declarado}, mas o conteúdo é {tipo}")
 
 class FileUploadMiddleware:
+    # Middleware ASGI: conta os bytes do corpo enquanto ele chega, sem depender do Content-Length
     def __init__(
         self,
-        max_size: int = 1024 * 1024 * 2, # 2MB
-        upload_routes: List[str] = None
+        app: ASGIApp,
+        limites: List[Tuple[str, int]] = None,
+        verificar_tipo: List[str] = None
     ):
-        self.max_size = max_size
-        self.upload_routes = upload_routes or ["/upload"]
+        self.app = app
+        self.limites = [(re.compile(padrao), limite) for padrao, limite in (limites or [(r"^/upload/", 1024 * 1024 * 2)])]
+        self.verificar_tipo = [re.compile(padrao) for padrao in (verificar_tipo or [])]
         self._setup_logging()
 
     def _setup_logging(self):
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger("upload_middleware")
 
-    async def __call__(self, request: Request, call_next: Callable):
-        if request.method == "POST" and request.url.path in self.upload_routes:
-            if "content-length" not in request.headers:
-                raise HTTPException(
-                    status_code=411,
-                    detail="Content-Length header não encontrado"
-                )
+    def limite_da_rota(self, caminho: str) -> Optional[int]:
+        for padrao, limite in self.limites:
+            if padrao.search(caminho):
+                return limite
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        caminho = scope["path"]
+        limite = self.limite_da_rota(caminho)
+        if limite is None:
+            await self.app(scope, receive, send)
+            return
+
+        cabecalhos = {nome.decode("latin-1"): valor.decode("latin-1") for nome, valor in scope["headers"]}
+        mensagem_limite = f"File size exceeds the maximum allowed size of {limite/1024/1024:.1f}MB"
+
+        # Content-Length declarado acima do limite: responde sem ler o corpo
+        content_length = cabecalhos.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limite:
+            self.logger.warning(f"Upload rejeitado em {caminho}: {int(content_length)/1024/1024:.1f}MB (max: {limite/1024/1024:.1f}MB)")
+            await JSONResponse({"detail": mensagem_limite}, status_code=413)(scope, receive, send)
+            return
+
+        inspetor = None
+        if any(padrao.search(caminho) for padrao in self.verificar_tipo):
+            boundary = boundary_multipart(cabecalhos.get("content-type", ""))
+            if boundary:
+                inspetor = InspetorMultipart(boundary)
+
+        recebidos = 0
+        rejeicao: Optional[CorpoRejeitado] = None
+        resposta_iniciada = False
 
-            content_length = int(request.headers["content-length"])
+        async def receive_contando() -> Message:
+            nonlocal recebidos, rejeicao
+            if rejeicao:
+                raise rejeicao
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                pedaco = mensagem.get("body", b"")
+                recebidos += len(pedaco)
+                try:
+                    if recebidos > limite:
+                        raise CorpoRejeitado(413, mensagem_limite)
+                    if inspetor:
+                        inspetor.alimentar(pedaco, fim=not mensagem.get("more_body", False))
+                except CorpoRejeitado as e:
+                    rejeicao = e
+                    raise
+            return mensagem
 
-            if content_length > self.max_size:
-                self.logger.warning(f"Upload rejeitado: {content_length/1024/1024:.1f}MB (max: {self.max_size/1024/1024:.1f}MB)")
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"File size exceeds the maximum allowed size of {self.max_size/1024/1024:.1f}MB"
-                )
+        async def send_controlado(mensagem: Message):
+            # Depois de uma rejeição, a resposta da rota (ex.: 400 do parser) é descartada
+            nonlocal resposta_iniciada
+            if rejeicao and not resposta_iniciada:
+                return
+            if mensagem["type"] == "http.response.start":
+                resposta_iniciada = True
+            await send(mensagem)
 
-            self.logger.info(f"Upload permitido: {content_length/1024/1024:.1f}MB")
+        try:
+            await self.app(scope, receive_contando, send_controlado)
+        except Exception:
+            # A rota pode embrulhar a rejeição em outra exceção; o que vale é a rejeição
+            if not rejeicao:
+                raise
 
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        if rejeicao:
+            if resposta_iniciada:
+                return
+            self.logger.warning(f"Upload rejeitado em {caminho} após {recebidos/1024/1024:.1f}MB: {rejeicao.detail}")
+            await JSONResponse({"detail": rejeicao.detail}, status_code=rejeicao.status_code)(scope, receive, send)
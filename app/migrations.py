@@ -0,0 +1,130 @@
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, engine
+from app.models import Base, Fan
+from app.services.tags import atribuir_tags_em_lote
+from app.services.estatisticas import reconstruir_estatisticas
+from app.services.engajamento import recalcular_engajamento
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_MIGRACAO = 1000
+
+def sincronizar_esquema():
+    # create_all só cria tabelas novas; aqui adicionamos colunas e índices que
+    # passaram a existir nos modelos depois que a tabela já havia sido criada
+    inspetor = inspect(engine)
+    with engine.begin() as conexao:
+        for tabela in Base.metadata.sorted_tables:
+            if not inspetor.has_table(tabela.name):
+                continue
+            existentes = {coluna["name"] for coluna in inspetor.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name in existentes:
+                    continue
+                tipo = coluna.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}"
+                if coluna.server_default is not None:
+                    if not coluna.nullable:
+                        ddl += " NOT NULL"
+                    ddl += f" DEFAULT '{coluna.server_default.arg}'"
+                logger.info(f"Adicionando coluna {tabela.name}.{coluna.name}")
+                conexao.execute(text(ddl))
+            for indice in tabela.indexes:
+                indice.create(bind=conexao, checkfirst=True)
+
+# Migração 0001: copia as colunas de texto legadas de Fan para tags/fan_tags
+def migrar_tags_normalizadas(db: Session):
+    colunas = {
+        "interesse": Fan.interesses,
+        "evento": Fan.eventos,
+        "compra": Fan.compras,
+        "atividade": Fan.atividades,
+    }
+    ultimo_id = 0
+    migrados = 0
+
+    while True:
+        fans = db.query(Fan.id, *colunas.values()).filter(
+            Fan.id > ultimo_id
+        ).order_by(Fan.id).limit(TAMANHO_LOTE_MIGRACAO).all()
+        if not fans:
+            break
+
+        atribuir_tags_em_lote(db, {
+            linha[0]: {
+                categoria: (valor or "").split(",")
+                for categoria, valor in zip(colunas, linha[1:])
+            }
+            for linha in fans
+        })
+
+        migrados += len(fans)
+        ultimo_id = fans[-1][0]
+
+    logger.info(f"Tags normalizadas para {migrados} fãs")
+
+# Migração 0003: preenche fans.pontos/engajamento e os contadores por nível
+def migrar_engajamento_materializado(db: Session):
+    recalcular_engajamento(db)
+    reconstruir_estatisticas(db)
+
+# Migração 0004: índice FTS5 sobre fans.nome, mantido por triggers
+def criar_busca_nome_fts(db: Session):
+    db.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS fans_fts USING fts5("
+        "nome, content='fans', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ))
+    db.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS fans_fts_ai AFTER INSERT ON fans BEGIN "
+        "INSERT INTO fans_fts(rowid, nome) VALUES (new.id, new.nome); END"
+    ))
+    db.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS fans_fts_ad AFTER DELETE ON fans BEGIN "
+        "INSERT INTO fans_fts(fans_fts, rowid, nome) VALUES ('delete', old.id, old.nome); END"
+    ))
+    db.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS fans_fts_au AFTER UPDATE OF nome ON fans BEGIN "
+        "INSERT INTO fans_fts(fans_fts, rowid, nome) VALUES ('delete', old.id, old.nome); "
+        "INSERT INTO fans_fts(rowid, nome) VALUES (new.id, new.nome); END"
+    ))
+    db.execute(text("INSERT INTO fans_fts(fans_fts) VALUES ('rebuild')"))
+
+# Migrações em ordem de aplicação; nunca renomeie ou reordene as existentes
+MIGRACOES = [
+    ("0001_tags_normalizadas", migrar_tags_normalizadas),
+    ("0002_estatisticas", reconstruir_estatisticas),
+    ("0003_engajamento_materializado", migrar_engajamento_materializado),
+    ("0004_busca_nome_fts", criar_busca_nome_fts),
+]
+
+def aplicar_migracoes():
+    sincronizar_esquema()
+
+    db = SessionLocal()
+    try:
+        db.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migracoes ("
+            "nome VARCHAR(100) PRIMARY KEY, aplicada_em DATETIME NOT NULL)"
+        ))
+        db.commit()
+        aplicadas = {linha[0] for linha in db.execute(text("SELECT nome FROM schema_migracoes"))}
+
+        for nome, migracao in MIGRACOES:
+            if nome in aplicadas:
+                continue
+            logger.info(f"Aplicando migração {nome}")
+            migracao(db)
+            db.execute(
+                text("INSERT INTO schema_migracoes (nome, aplicada_em) VALUES (:nome, :aplicada_em)"),
+                {"nome": nome, "aplicada_em": datetime.utcnow()}
+            )
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Table, Index, UniqueConstraint, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 
 class FanCadastro(BaseModel):
@@ -52,10 +52,36 @@ class Fan(Base):
     nome = Column(String(50), nullable=False)
     endereco = Column(String(255), nullable=False)
     cpf = Column(String(11), nullable=False)
+    # Colunas legadas (texto separado por vírgulas), mantidas apenas para a
+    # migração; interesses, eventos, compras e atividades vivem em fan_tags
     atividades = Column(Text)
     interesses = Column(Text)
     eventos = Column(Text)
     compras = Column(Text)
+    # Engajamento materializado, recalculado por app/services/engajamento.py
+    pontos = Column(Integer, nullable=False, default=0, server_default="0")
+    engajamento = Column(String(10), nullable=False, default="Baixo", server_default="Baixo", index=True)
+
+    __table_args__ = (
+        Index("ix_fans_pontos_id", "pontos", "id"),
+    )
+
+class Tag(Base):
+    __tablename__ = "tags"
+    __table_args__ = (
+        UniqueConstraint("categoria", "nome", name="uq_tags_categoria_nome"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    categoria = Column(String(20), nullable=False)
+    nome = Column(String(100), nullable=False)
+
+fan_tags = Table(
+    "fan_tags",
+    Base.metadata,
+    Column("fan_id", Integer, ForeignKey("fans.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_fan_tags_tag_id_fan_id", "tag_id", "fan_id"),
+)
 
 class Documento(Base):
     __tablename__ = "documentos"
@@ -64,11 +90,61 @@ class Documento(Base):
     documento_nome = Column(String(100), nullable=False)
     validado = Column(Boolean, default=False)
     texto_extraido = Column(Text)
+    # Documentos enviados juntos em /upload/{fan_id}/batch são validados pelo texto do grupo
+    lote_id = Column(String(36), index=True)
 
 class RedeSocial(Base):
     __tablename__ = "redes_sociais"
     id = Column(Integer, primary_key=True, index=True)
-    fan_id = Column(Integer, ForeignKey('fans.id'), nullable=False)
+    fan_id = Column(Integer, ForeignKey('fans.id'), nullable=False, index=True)
     link = Column(String, nullable=False)
     tipo = Column(String, nullable=False)
     validado = Column(Boolean, default=False)
+
+class Estatistica(Base):
+    # Contadores agregados mantidos a cada escrita (categoria "geral" guarda os totais)
+    __tablename__ = "estatisticas"
+    __table_args__ = (
+        Index("ix_estatisticas_categoria_valor", "categoria", "valor"),
+    )
+    categoria = Column(String(20), primary_key=True)
+    nome = Column(String(100), primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+
+class JobDocumento(Base):
+    # Fila persistente de processamento de documentos (upload assíncrono)
+    __tablename__ = "jobs_documentos"
+    __table_args__ = (
+        Index("ix_jobs_documentos_status_disponivel_em", "status", "disponivel_em"),
+    )
+    id = Column(String(36), primary_key=True)
+    fan_id = Column(Integer, ForeignKey('fans.id'), nullable=False)
+    documento_nome = Column(String(100), nullable=False)
+    caminho_arquivo = Column(String(255), nullable=False)
+    content_type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="pendente")
+    tentativas = Column(Integer, nullable=False, default=0)
+    max_tentativas = Column(Integer, nullable=False, default=3)
+    disponivel_em = Column(DateTime, nullable=False)
+    erro = Column(Text)
+    documento_id = Column(Integer, ForeignKey('documentos.id'))
+    criado_em = Column(DateTime, nullable=False)
+    atualizado_em = Column(DateTime, nullable=False)
+
+class CacheOcr(Base):
+    # Texto extraído por hash SHA-256 do arquivo + configuração do OCR
+    __tablename__ = "cache_ocr"
+    chave = Column(String(64), primary_key=True)
+    texto_extraido = Column(Text, nullable=False)
+    tamanho = Column(Integer, nullable=False)
+    criado_em = Column(DateTime, nullable=False)
+    acessado_em = Column(DateTime, nullable=False, index=True)
+
+class CachePerfil(Base):
+    # Texto extraído de perfis públicos por link normalizado, com os validadores HTTP da última busca
+    __tablename__ = "cache_perfis"
+    link = Column(String(255), primary_key=True)
+    conteudo = Column(Text, nullable=False)
+    etag = Column(String(255))
+    last_modified = Column(String(64))
+    buscado_em = Column(DateTime, nullable=False, index=True)
@@ -1,9 +1,20 @@
-from fastapi import APIRouter, Request, HTTPException, status, Depends
+import csv
+import time
+from typing import Optional
+from fastapi import APIRouter, Request, HTTPException, status, Depends, Query
+from starlette.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from ..database import get_db, engine
 from ..models import Fan, FanCadastro, Base
+from ..services.tags import atribuir_tags
+from ..services.estatisticas import registrar_fans
+from ..services.engajamento import recalcular_engajamento
+from ..services.importacao import (
+    TAMANHO_LOTE_IMPORTACAO, MAX_ERROS_REPORTADOS, linhas_do_corpo,
+    registro_ndjson, registro_csv, validar_registro, descrever_erro, gravar_lote
+)
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -20,13 +31,20 @@ def cadastro_fan(fan: FanCadastro, request: Request, db: Session = Depends(get_d
         db_fan = Fan(
             nome = fan.nome,
             endereco = fan.endereco,
-            cpf = fan.cpf.replace(".", "").replace("-", ""),
-            atividades = ",".join(fan.atividades) if fan.atividades else "",
-            interesses = ",".join(fan.interesses) if fan.interesses else "",
-            eventos = ",".join(fan.eventos) if fan.eventos else "",
-            compras = ",".join(fan.compras) if fan.compras else ""
+            cpf = fan.cpf.replace(".", "").replace("-", "")
         )
         db.add(db_fan)
+        db.flush()
+
+        tags_por_categoria = {
+            "interesse": fan.interesses,
+            "evento": fan.eventos,
+            "compra": fan.compras,
+            "atividade": fan.atividades
+        }
+        atribuir_tags(db, db_fan.id, tags_por_categoria)
+        registrar_fans(db, [tags_por_categoria])
+        recalcular_engajamento(db, [db_fan.id])
         db.commit()
         db.refresh(db_fan)
 
@@ -40,4 +58,69 @@ def cadastro_fan(fan: FanCadastro, request: Request, db: Session = Depends(get_d
         raise HTTPException(
             status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail = f"Erro ao cadastrar: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+# Rota para importar fãs em massa a partir de NDJSON (um FanCadastro por linha)
+# ou CSV (listas separadas por "|"), lendo o corpo em streaming
+@router.post("/cadastro/importar")
+async def importar_fans(
+    request: Request,
+    formato: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="ndjson ou csv; padrão deduzido do Content-Type"),
+    db: Session = Depends(get_db)
+):
+    if not formato:
+        formato = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    inicio = time.perf_counter()
+    total_linhas = 0
+    importados = 0
+    erros = []
+    total_erros = 0
+    cabecalho = None
+    lote = []
+
+    def registrar_erros(novos):
+        nonlocal total_erros
+        total_erros += len(novos)
+        erros.extend(novos[:max(MAX_ERROS_REPORTADOS - len(erros), 0)])
+
+    numero = 0
+    async for linha in linhas_do_corpo(request.stream()):
+        numero += 1
+        if not linha.strip():
+            continue
+
+        try:
+            texto = linha.decode("utf-8")
+            if formato == "csv" and cabecalho is None:
+                cabecalho = [coluna.strip() for coluna in next(csv.reader([texto]))]
+                continue
+            total_linhas += 1
+            registro = registro_csv(texto, cabecalho) if formato == "csv" else registro_ndjson(texto)
+            lote.append((numero, validar_registro(registro)))
+        except Exception as e:
+            registrar_erros([{"linha": numero, "erros": descrever_erro(e)}])
+            continue
+
+        if len(lote) >= TAMANHO_LOTE_IMPORTACAO:
+            gravados, erros_lote = await run_in_threadpool(gravar_lote, db, lote)
+            importados += gravados
+            registrar_erros(erros_lote)
+            lote = []
+
+    if lote:
+        gravados, erros_lote = await run_in_threadpool(gravar_lote, db, lote)
+        importados += gravados
+        registrar_erros(erros_lote)
+
+    duracao = time.perf_counter() - inicio
+    return {
+        "formato": formato,
+        "total_linhas": total_linhas,
+        "importados": importados,
+        "total_erros": total_erros,
+        "erros": erros,
+        "duracao_segundos": round(duracao, 3),
+        "linhas_por_segundo": round(total_linhas / duracao, 1) if duracao > 0 else None,
+        "mensagem": f"{importados} de {total_linhas} fãs importados"
+    }
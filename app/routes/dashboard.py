@@ -1,149 +1,269 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, cast, Integer
+from sqlalchemy import func, case, cast, Integer, literal, tuple_
 from app.database import get_db
-from app.models import Fan, RedeSocial, Documento
+from app.models import Fan, RedeSocial, Documento, Estatistica, Tag, fan_tags
+from app.services.tags import carregar_tags
+from app.services.estatisticas import ler_totais, ler_top
+from app.services.filtros import aplicar_filtros_fans, busca_por_nome, normalizar_nivel_engajamento
 from typing import List, Optional
+import base64
+import json
 
 router = APIRouter()
 
-def calcular_engajamento(
-    redes_validadas: int,
-    eventos: int,
-    compras: int,
-) -> str:
-    pontos = redes_validadas * 2 + eventos + compras
-
-    if pontos >= 5:
-        return "Alto"
-    elif pontos >= 2:
-        return "Médio"
-    else:
-        return "baixo"
+def contar_redes_validadas(db: Session, fan_ids: List[int]) -> dict:
+    # Redes validadas apenas dos fãs da página, usando o índice de redes_sociais.fan_id
+    if not fan_ids:
+        return {}
+    linhas = db.query(RedeSocial.fan_id, func.count(RedeSocial.id)).filter(
+        RedeSocial.fan_id.in_(fan_ids),
+        RedeSocial.validado == True
+    ).group_by(RedeSocial.fan_id).all()
+    return {fan_id: total for fan_id, total in linhas}
+
+def ordenar_fans(query, ordenar: str, busca=None):
+    # Ordenações estáveis cobertas por índices (id e ix_fans_pontos_id) ou pelo FTS5
+    if ordenar == "relevancia":
+        return query.order_by(busca.c.relevancia, Fan.id)
+    if ordenar == "engajamento":
+        return query.order_by(Fan.pontos.desc(), Fan.id.desc())
+    return query.order_by(Fan.id)
+
+def codificar_cursor(ordenar: str, fan: Fan, relevancia: Optional[float] = None) -> str:
+    dados = {"o": ordenar, "id": fan.id}
+    if ordenar == "engajamento":
+        dados["p"] = fan.pontos
+    elif ordenar == "relevancia":
+        dados["r"] = relevancia
+    return base64.urlsafe_b64encode(json.dumps(dados).encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str, ordenar: str) -> dict:
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        if dados["o"] != ordenar:
+            raise ValueError("ordenação diferente da usada no cursor")
+        int(dados["id"])
+        if ordenar == "engajamento":
+            int(dados["p"])
+        elif ordenar == "relevancia":
+            float(dados["r"])
+        return dados
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cursor inválido: {str(e)}"
+        )
+
+def total_aproximado(db: Session, interesse, evento, compra, engajamento, nome=None) -> Optional[int]:
+    # Total vindo dos contadores quando há no máximo um filtro; None caso contrário
+    if nome:
+        return None
+    filtros = [
+        (categoria, valor)
+        for categoria, valor in (
+            ("interesse", interesse),
+            ("evento", evento),
+            ("compra", compra),
+            ("engajamento", normalizar_nivel_engajamento(engajamento))
+        )
+        if valor
+    ]
+    if not filtros:
+        return ler_totais(db).get("total_fans", 0)
+    if len(filtros) == 1:
+        categoria, valor = filtros[0]
+        return db.query(Estatistica.valor).filter(
+            Estatistica.categoria == categoria,
+            Estatistica.nome == valor.strip()
+        ).scalar() or 0
+    return None
+
+def montar_resultados(db: Session, fans: List[Fan]) -> List[dict]:
+    fan_ids = [fan.id for fan in fans]
+    tags = carregar_tags(db, fan_ids)
+    redes_validadas = contar_redes_validadas(db, fan_ids)
+
+    return [
+        {
+            "id": fan.id,
+            "nome": fan.nome,
+            "interesses": tags[fan.id]["interesse"],
+            "eventos": tags[fan.id]["evento"],
+            "compras": tags[fan.id]["compra"],
+            "redes_validadas": redes_validadas.get(fan.id, 0),
+            "pontos": fan.pontos,
+            "engajamento": fan.engajamento
+        }
+        for fan in fans
+    ]
 
 @router.get("/dashboard/fans")
 async def listar_fans(
     db: Session = Depends(get_db),
+    nome: Optional[str] = Query(None, description="Buscar por nome (prefixo, sem diferenciar acentos)"),
     interesse: Optional[str] = Query(None, description="Filtrar por interesse"),
     evento: Optional[str] = Query(None, description="Filtrar por evento"),
     compra: Optional[str] = Query(None, description="Filtrar por compra"),
     engajamento: Optional[str] = Query(None, description="Filtrar por nível de engajamento (Alto, Médio, Baixo)"),
+    ordenar: Optional[str] = Query(None, pattern="^(id|engajamento|relevancia)$", description="Ordenação: id, engajamento (maior pontuação primeiro) ou relevancia (padrão quando há busca por nome)"),
     page: int = Query(1, ge=1, le=100, description="Número de página"),
-    page_size: int = Query(10, ge=1, le=100, description="Itens por página")
+    page_size: int = Query(10, ge=1, le=100, description="Itens por página"),
+    cursor: bool = Query(False, description="Usar paginação por cursor (keyset) em vez de páginas numeradas"),
+    after: Optional[str] = Query(None, description="Cursor retornado em next_cursor; implica paginação por cursor"),
+    total: str = Query("aproximado", pattern="^(nenhum|aproximado|exato)$", description="Cálculo do total na paginação por cursor")
 ):
+    busca = busca_por_nome(nome) if nome else None
+    if busca is None and ordenar == "relevancia":
+        raise HTTPException(
+            status_code=400,
+            detail="A ordenação por relevância exige o parâmetro nome"
+        )
+    ordenar = ordenar or ("relevancia" if busca is not None else "id")
+    relevancia = busca.c.relevancia if busca is not None else literal(None)
 
-    query = db.query(Fan)
-
-    if interesse:
-        query = query.filter(Fan.interesses.like(f"%{interesse}%"))
-
-    if evento:
-        query = query.filter(Fan.interesses.like(f"%{evento}%"))
-
-    if compra:
-        query = query.filter(Fan.compras.like(f"%{compra}%"))
-
-    total_fans = query.count()
-
-    offset = (page - 1) * page_size
-    fans = query.offset(offset).limit(page_size).all()
+    def consultar(*entidades):
+        query = db.query(Fan, relevancia.label("relevancia"), *entidades)
+        if busca is not None:
+            query = query.join(busca, busca.c.fan_id == Fan.id)
+        return aplicar_filtros_fans(query, interesse, evento, compra, engajamento)
 
-    resultados = []
+    if cursor or after:
+        # Paginação por cursor: custo constante por página, sem OFFSET nem COUNT
+        filtrados = consultar()
+        query = filtrados
+        if after:
+            posicao = decodificar_cursor(after, ordenar)
+            if ordenar == "relevancia":
+                query = query.filter(tuple_(busca.c.relevancia, Fan.id) > tuple_(posicao["r"], posicao["id"]))
+            elif ordenar == "engajamento":
+                query = query.filter(tuple_(Fan.pontos, Fan.id) < tuple_(posicao["p"], posicao["id"]))
+            else:
+                query = query.filter(Fan.id > posicao["id"])
 
-    for fan in fans:
-        interesses = fan.interesses.split(',') if fan.interesses else []
-        eventos = fan.eventos.split(',') if fan.eventos else []
-        compras = fan.compras.split(',') if fan.compras else []
+        # Uma linha a mais indica se existe próxima página
+        linhas = ordenar_fans(query, ordenar, busca).limit(page_size + 1).all()
+        proxima = len(linhas) > page_size
+        linhas = linhas[:page_size]
 
-        redes_validadas = db.query(func.count(RedeSocial.id)).filter(
-            RedeSocial.fan_id == fan.id,
-            RedeSocial.validado == True
-        ).scalar() or 0
+        if total == "exato":
+            total_fans = filtrados.with_entities(func.count(Fan.id)).scalar() or 0
+        elif total == "aproximado":
+            total_fans = total_aproximado(db, interesse, evento, compra, engajamento, nome)
+        else:
+            total_fans = None
 
-        nivel_engajamento = calcular_engajamento(
-            redes_validadas=redes_validadas,
-            eventos=len(eventos),
-            compras=len(compras)
-        )
+        return {
+            "total": total_fans,
+            "page_size": page_size,
+            "next_cursor": codificar_cursor(ordenar, *linhas[-1]) if proxima else None,
+            "fans": montar_resultados(db, [fan for fan, _ in linhas])
+        }
 
-        if engajamento and nivel_engajamento.lower() != engajamento.lower():
-            continue
+    query = consultar(func.count().over().label("total"))
 
-        resultados.append({
-            "id": fan.id,
-            "nome": fan.nome,
-            "interesses": interesses,
-            "eventos": eventos,
-            "compras": compras,
-            "redes_validadas": redes_validadas,
-            "engajamento": nivel_engajamento
-        })
+    offset = (page - 1) * page_size
+    linhas = ordenar_fans(query, ordenar, busca).offset(offset).limit(page_size).all()
 
-    total_filtrado = len(resultados) if engajamento else total_fans
+    if linhas:
+        total_fans = linhas[0].total
+    else:
+        # Página além do fim: o total não vem junto das linhas
+        total_fans = query.with_entities(func.count(Fan.id)).order_by(None).scalar() or 0
 
     return {
-        "total": total_filtrado,
+        "total": total_fans,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total_filtrado + page_size - 1) // page_size,
-        "fans": resultados
+        "total_pages": (total_fans + page_size - 1) // page_size,
+        "fans": montar_resultados(db, [fan for fan, _, _ in linhas])
     }
 
 @router.get("/dashboard/stats")
-async def estatisticas_dashboard(db: Session = Depends(get_db)):
-    total_fans = db.query(func.count(Fan.id)).scalar()
-
-    fans_com_redes = db.query(
-        Fan.id,
-        func.count(RedeSocial.id).filter(RedeSocial.validado == True).label("redes_validadas")
-    ).outerjoin(RedeSocial).group_by(Fan.id).subquery()
-
-    interesses_query = db.query(Fan.interesses).all()
-    todos_interesses = []
-    for interesses_str in interesses_query:
-        if interesses_str[0]:
-            todos_interesses.extend(interesses_str[0].split(','))
-
-    interesses_contagem = {}
-    for interesse in todos_interesses:
-        interesse = interesse.strip()
-        if interesse:
-            interesses_contagem[interesse] = interesses_contagem.get(interesse, 0) + 1
-
-    top_interesses = sorted(interesses_contagem.items(), key=lambda x: x[1], reverse=True)[:5]
-
-    eventos_query = db.query(Fan.eventos).all()
-    todos_eventos = []
-    for evento_str in eventos_query:
-        if evento_str[0]:
-            todos_eventos.extend(evento_str[0].split(','))
-
-    eventos_contagem = {}
-    for evento in todos_eventos:
-        evento = evento.strip()
-        if evento:
-            eventos_contagem[evento] = eventos_contagem.get(evento, 0) + 1
-
-    top_eventos = sorted(eventos_contagem.items(), key=lambda x: x[1], reverse=True)[:5]
-
-    compras_query = db.query(Fan.compras).all()
-    todas_compras = []
-    for compra_str in compras_query:
-        if compra_str[0]:
-            todas_compras.extend(compra_str[0].split(','))
-
-    compras_contagem = {}
-    for compra in todas_compras:
-        compra = compra.strip()
-        if compra:
-            compras_contagem[compra] = compras_contagem.get(compra, 0) + 1
-
-    # Top 5 compras
-    top_compras = sorted(compras_contagem.items(), key=lambda x: x[1], reverse=True)[:5]
+async def estatisticas_dashboard(
+    db: Session = Depends(get_db),
+    top: int = Query(5, ge=1, le=50, description="Quantidade de itens em cada ranking")
+):
+    # Lido dos contadores mantidos em cada escrita (ver app/services/estatisticas.py)
+    totais = ler_totais(db)
+    niveis = dict(ler_top(db, "engajamento", 3))
 
     return {
-        "total_fans": total_fans,
-        "top_interesses": top_interesses,
-        "top_eventos": top_eventos,
-        "top_compras": top_compras
-    }
\ No newline at end of file
+        "total_fans": totais.get("total_fans", 0),
+        "total_redes_validadas": totais.get("redes_validadas", 0),
+        "engajamento": {nivel: niveis.get(nivel, 0) for nivel in ("Alto", "Médio", "Baixo")},
+        "top_interesses": ler_top(db, "interesse", top),
+        "top_eventos": ler_top(db, "evento", top),
+        "top_compras": ler_top(db, "compra", top)
+    }
+
+
+FACETAS = {
+    "interesses": "interesse",
+    "eventos": "evento",
+    "compras": "compra",
+}
+
+@router.get("/dashboard/facets")
+async def facetas_dashboard(
+    db: Session = Depends(get_db),
+    interesse: Optional[str] = Query(None, description="Filtrar por interesse"),
+    evento: Optional[str] = Query(None, description="Filtrar por evento"),
+    compra: Optional[str] = Query(None, description="Filtrar por compra"),
+    engajamento: Optional[str] = Query(None, description="Filtrar por nível de engajamento (Alto, Médio, Baixo)"),
+    limite: int = Query(50, ge=1, le=500, description="Máximo de valores por faceta")
+):
+    if not (interesse or evento or compra or engajamento):
+        # Sem filtros, as contagens já estão nos contadores agregados
+        resultado = {
+            faceta: [{"valor": nome, "total": total} for nome, total in ler_top(db, categoria, limite)]
+            for faceta, categoria in FACETAS.items()
+        }
+        resultado["engajamento"] = [
+            {"valor": nome, "total": total} for nome, total in ler_top(db, "engajamento", 3)
+        ]
+        return resultado
+
+    fans_filtrados = aplicar_filtros_fans(
+        db.query(Fan.id), interesse, evento, compra, engajamento
+    ).subquery()
+
+    # Contagem por tag dos fãs filtrados, com as N maiores de cada categoria
+    quantidade = func.count(fan_tags.c.fan_id)
+    contagens = db.query(
+        Tag.categoria.label("categoria"),
+        Tag.nome.label("nome"),
+        quantidade.label("quantidade"),
+        func.row_number().over(
+            partition_by=Tag.categoria,
+            order_by=(quantidade.desc(), Tag.nome)
+        ).label("posicao")
+    ).join(
+        fan_tags, fan_tags.c.tag_id == Tag.id
+    ).join(
+        fans_filtrados, fans_filtrados.c.id == fan_tags.c.fan_id
+    ).filter(
+        Tag.categoria.in_(list(FACETAS.values()))
+    ).group_by(Tag.id).subquery()
+
+    linhas = db.query(
+        contagens.c.categoria,
+        contagens.c.nome,
+        contagens.c.quantidade
+    ).filter(
+        contagens.c.posicao <= limite
+    ).order_by(contagens.c.categoria, contagens.c.posicao).all()
+
+    por_categoria = {categoria: [] for categoria in FACETAS.values()}
+    for categoria, nome, total in linhas:
+        por_categoria[categoria].append({"valor": nome, "total": total})
+
+    resultado = {faceta: por_categoria[categoria] for faceta, categoria in FACETAS.items()}
+
+    niveis = aplicar_filtros_fans(
+        db.query(Fan.engajamento, func.count(Fan.id)), interesse, evento, compra, engajamento
+    ).group_by(Fan.engajamento).order_by(func.count(Fan.id).desc()).all()
+    resultado["engajamento"] = [{"valor": nivel, "total": total} for nivel, total in niveis]
+
+    return resultado
@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+from typing import Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from app.database import SessionLocal
+from app.models import Fan, RedeSocial
+from app.services.filtros import aplicar_filtros_fans, busca_por_nome, normalizar_nivel_engajamento
+from app.services.tags import CATEGORIAS_TAGS, SEPARADOR_LISTA_CSV, carregar_tags
+
+router = APIRouter()
+
+TAMANHO_LOTE_EXPORTACAO = 1000
+
+COLUNAS_EXPORTACAO = [
+    "id", "nome", "interesses", "eventos", "compras", "atividades",
+    "redes_validadas", "pontos", "engajamento"
+]
+
+FORMATOS_EXPORTACAO = {
+    "ndjson": ("application/x-ndjson", "fans.ndjson"),
+    "csv": ("text/csv; charset=utf-8", "fans.csv"),
+    "parquet": ("application/vnd.apache.parquet", "fans.parquet"),
+}
+
+def consulta_exportacao(nome, interesse, evento, compra, engajamento):
+    # Redes validadas vêm de uma subconsulta correlacionada resolvida pelo SQLite via índice;
+    # as tags são carregadas por lote em lotes_de_registros, na ordem em que o fã as informou
+    redes_validadas = select(func.count(RedeSocial.id)).where(
+        RedeSocial.fan_id == Fan.id,
+        RedeSocial.validado == True
+    ).scalar_subquery()
+
+    consulta = select(
+        Fan.id, Fan.nome, Fan.pontos, Fan.engajamento,
+        redes_validadas.label("redes_validadas")
+    )
+    if nome:
+        busca = busca_por_nome(nome)
+        consulta = consulta.join(busca, busca.c.fan_id == Fan.id)
+
+    return aplicar_filtros_fans(consulta, interesse, evento, compra, engajamento).order_by(Fan.id)
+
+def montar_registro(linha, tags) -> dict:
+    registro = {
+        "id": linha.id,
+        "nome": linha.nome,
+        "redes_validadas": linha.redes_validadas,
+        "pontos": linha.pontos,
+        "engajamento": linha.engajamento
+    }
+    for categoria, campo in CATEGORIAS_TAGS.items():
+        registro[campo] = tags[categoria]
+    return registro
+
+def lotes_de_registros(consulta):
+    # Paginação por Fan.id com uma sessão curta por lote: nenhuma leitura fica aberta
+    # enquanto o cliente consome a resposta (no SQLite ela bloquearia as escritas)
+    ultimo_id = None
+    while True:
+        pagina = consulta if ultimo_id is None else consulta.where(Fan.id > ultimo_id)
+        with SessionLocal() as db:
+            linhas = db.execute(pagina.limit(TAMANHO_LOTE_EXPORTACAO)).all()
+            tags = carregar_tags(db, [linha.id for linha in linhas])
+        if not linhas:
+            return
+        ultimo_id = linhas[-1].id
+        yield [montar_registro(linha, tags[linha.id]) for linha in linhas]
+        if len(linhas) < TAMANHO_LOTE_EXPORTACAO:
+            return
+
+def gerar_ndjson(consulta):
+    for registros in lotes_de_registros(consulta):
+        yield "".join(json.dumps(registro, ensure_ascii=False) + "\n" for registro in registros)
+
+def gerar_csv(consulta):
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=COLUNAS_EXPORTACAO)
+    escritor.writeheader()
+
+    for registros in lotes_de_registros(consulta):
+        for registro in registros:
+            for campo in CATEGORIAS_TAGS.values():
+                registro[campo] = SEPARADOR_LISTA_CSV.join(registro[campo])
+            escritor.writerow(registro)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    yield buffer.getvalue()
+
+class _BufferSaida(io.RawIOBase):
+    # Arquivo em memória esvaziado a cada lote, para o Parquet sair em pedaços
+    def __init__(self):
+        self.pedacos = []
+        self.posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.pedacos.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def esvaziar(self) -> bytes:
+        dados = b"".join(self.pedacos)
+        self.pedacos = []
+        return dados
+
+def gerar_parquet(consulta):
+    # pyarrow é pesado; só é importado quando o formato é pedido
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([
+        ("id", pa.int64()),
+        ("nome", pa.string()),
+        ("interesses", pa.list_(pa.string())),
+        ("eventos", pa.list_(pa.string())),
+        ("compras", pa.list_(pa.string())),
+        ("atividades", pa.list_(pa.string())),
+        ("redes_validadas", pa.int64()),
+        ("pontos", pa.int64()),
+        ("engajamento", pa.string()),
+    ])
+
+    saida = _BufferSaida()
+    escritor = pq.ParquetWriter(saida, esquema)
+    try:
+        # Cada lote vira um row group, enviado assim que é escrito
+        for registros in lotes_de_registros(consulta):
+            escritor.write_table(pa.Table.from_pylist(registros, schema=esquema))
+            yield saida.esvaziar()
+    finally:
+        escritor.close()
+    yield saida.esvaziar()
+
+GERADORES = {
+    "ndjson": gerar_ndjson,
+    "csv": gerar_csv,
+    "parquet": gerar_parquet,
+}
+
+@router.get("/export/fans")
+def exportar_fans(
+    formato: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$", description="Formato do arquivo: ndjson, csv ou parquet"),
+    nome: Optional[str] = Query(None, description="Buscar por nome (prefixo, sem diferenciar acentos)"),
+    interesse: Optional[str] = Query(None, description="Filtrar por interesse"),
+    evento: Optional[str] = Query(None, description="Filtrar por evento"),
+    compra: Optional[str] = Query(None, description="Filtrar por compra"),
+    engajamento: Optional[str] = Query(None, description="Filtrar por nível de engajamento (Alto, Médio, Baixo)")
+):
+    # Valida os filtros antes de começar a resposta, para erros virarem 400
+    normalizar_nivel_engajamento(engajamento)
+    consulta = consulta_exportacao(nome, interesse, evento, compra, engajamento)
+
+    media_type, nome_arquivo = FORMATOS_EXPORTACAO[formato]
+    return StreamingResponse(
+        GERADORES[formato](consulta),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'}
+    )
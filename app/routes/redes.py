@@ -1,3 +1,7 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException, Depends, status, Body
 from app.models import RedeSocial, Fan, RedesSociaisInput
 from sqlalchemy.exc import SQLAlchemyError
@@ -7,9 +11,45 @@ from app.database import get_db
 import requests
 import re
 from app.services.ai_validator import extrair_conteudo_do_perfil, validar_conteudo_com_ia
+from app.services.metricas_extracao import metricas_extracao
+from app.services.tags import tags_do_fan
+from app.services.estatisticas import registrar_redes_validadas
+from app.services.engajamento import recalcular_engajamento
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+# Extrações de perfis em paralelo: limite de threads, tempo por rede e prazo total da requisição
+REDES_MAX_WORKERS = int(os.getenv("REDES_MAX_WORKERS", "4"))
+REDES_TIMEOUT_POR_REDE = float(os.getenv("REDES_TIMEOUT_POR_REDE", "20"))
+REDES_PRAZO_TOTAL = float(os.getenv("REDES_PRAZO_TOTAL", "45"))
+
+executor_redes = ThreadPoolExecutor(max_workers=REDES_MAX_WORKERS, thread_name_prefix="validar-redes")
+
+def extrair_e_validar(link: str, tipo_rede: str, interesses: List[str]) -> dict:
+    conteudo = extrair_conteudo_do_perfil(link, tipo_rede)
+    return validar_conteudo_com_ia(conteudo, interesses)
+
+async def validar_rede_com_timeout(link: str, tipo_rede: str, interesses: List[str], iniciada: asyncio.Event) -> dict:
+    # O tempo por rede só começa a contar quando uma thread pega a extração; a espera
+    # na fila do executor (compartilhado entre requisições) fica só sob o prazo total.
+    # O timeout libera a resposta; a thread termina sozinha quando o site responder
+    loop = asyncio.get_running_loop()
+
+    def executar():
+        loop.call_soon_threadsafe(iniciada.set)
+        return extrair_e_validar(link, tipo_rede, interesses)
+
+    futuro = loop.run_in_executor(executor_redes, executar)
+    try:
+        await iniciada.wait()
+    except asyncio.CancelledError:
+        # Prazo total esgotado antes de começar: tira a extração da fila
+        futuro.cancel()
+        raise
+    return await asyncio.wait_for(futuro, timeout=REDES_TIMEOUT_POR_REDE)
+
 def validar_url(url: str, tipo_rede: str) -> bool:
     padroes = {
         "instagram": r"^https?://(?:www\.)?instagram\.com/[a-zA-Z0-9_\.]+/?$",
@@ -43,7 +83,14 @@ async def adicionar_redes(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Fã com ID {fan_id} não encontrado."
             )
+        redes_validadas_removidas = db.query(RedeSocial).filter(
+            RedeSocial.fan_id == fan_id,
+            RedeSocial.validado == True
+        ).count()
         db.query(RedeSocial).filter(RedeSocial.fan_id == fan_id).delete()
+        registrar_redes_validadas(db, -redes_validadas_removidas)
+        if redes_validadas_removidas:
+            recalcular_engajamento(db, [fan_id])
 
         redes_adicionadas = []
         redes_invalidas = []
@@ -91,6 +138,11 @@ async def adicionar_redes(
             detail=f"Erro ao processar redes sociais: {str(e)}"
         )
 
+@router.get("/redes/metricas")
+async def metricas_redes():
+    # Taxa de acerto e latência de cada camada de extração, por rede
+    return metricas_extracao.resumo()
+
 @router.get("/redes/{fan_id}", response_model=List[Dict])
 async def obter_redes(fan_id: int, db: Session = Depends(get_db)):
 
@@ -133,40 +185,87 @@ async def validar_redes(
             )
 
         # Extrair interesses do fã
-        interesses = []
-        if fan.interesses:
-            # Converter string de interesses para lista
-            interesses = fan.interesses.split(',') if isinstance(fan.interesses, str) else []
+        interesses = tags_do_fan(db, fan_id, "interesse")
 
         resultados_validacao = []
+        delta_validadas = 0
+
+        # Todas as redes são extraídas e validadas ao mesmo tempo
+        iniciadas = [asyncio.Event() for _ in redes]
+        tarefas = [
+            asyncio.create_task(validar_rede_com_timeout(rede.link, rede.tipo, interesses, iniciada))
+            for rede, iniciada in zip(redes, iniciadas)
+        ]
+        _, pendentes = await asyncio.wait(tarefas, timeout=REDES_PRAZO_TOTAL)
+        for tarefa in pendentes:
+            tarefa.cancel()
+
+        for rede, tarefa, iniciada in zip(redes, tarefas, iniciadas):
+            # Sem thread livre até o fim do prazo: a rede nem chegou a ser consultada
+            if tarefa in pendentes and not iniciada.is_set():
+                logger.warning(f"Validação de {rede.tipo} do fã {fan_id} não começou dentro do prazo: {rede.link}")
+                resultados_validacao.append({
+                    "tipo": rede.tipo,
+                    "link": rede.link,
+                    "validado": rede.validado,
+                    "situacao": "nao_iniciada",
+                    "confianca": None,
+                    "motivo": "Servidor ocupado; a rede não chegou a ser consultada e o status anterior foi mantido"
+                })
+                continue
+            # Redes que não terminaram a tempo mantêm o status anterior
+            if tarefa in pendentes or isinstance(tarefa.exception(), asyncio.TimeoutError):
+                logger.warning(f"Tempo esgotado ao validar {rede.tipo} do fã {fan_id}: {rede.link}")
+                resultados_validacao.append({
+                    "tipo": rede.tipo,
+                    "link": rede.link,
+                    "validado": rede.validado,
+                    "situacao": "tempo_esgotado",
+                    "confianca": None,
+                    "motivo": "O perfil não respondeu a tempo; o status anterior foi mantido"
+                })
+                continue
+            if tarefa.exception() is not None:
+                logger.error(f"Erro ao validar {rede.tipo} do fã {fan_id}: {str(tarefa.exception())}")
+                resultados_validacao.append({
+                    "tipo": rede.tipo,
+                    "link": rede.link,
+                    "validado": rede.validado,
+                    "situacao": "erro",
+                    "confianca": None,
+                    "motivo": f"Erro durante a validação: {str(tarefa.exception())}"
+                })
+                continue
 
-        # Para cada rede social, fazer a validação com IA
-        for rede in redes:
-            # Extrair conteúdo do perfil
-            conteudo = extrair_conteudo_do_perfil(rede.link, rede.tipo)
-
-            # Validar conteúdo com IA
-            resultado = validar_conteudo_com_ia(conteudo, interesses)
+            resultado = tarefa.result()
 
             # Atualizar o status de validação
+            delta_validadas += int(resultado["relevante"]) - int(bool(rede.validado))
             rede.validado = resultado["relevante"]
 
             resultados_validacao.append({
                 "tipo": rede.tipo,
                 "link": rede.link,
                 "validado": rede.validado,
+                "situacao": "concluida",
                 "confianca": resultado["confianca"],
                 "motivo": resultado["motivo"]
             })
 
+        incompletas = sum(1 for resultado in resultados_validacao if resultado["situacao"] != "concluida")
+        registrar_redes_validadas(db, delta_validadas)
+        if delta_validadas:
+            recalcular_engajamento(db, [fan_id])
         db.commit()
 
         return {
             "fan_id": fan_id,
             "resultados": resultados_validacao,
-            "mensagem": "Validação de redes sociais concluída com IA"
+            "mensagem": "Validação de redes sociais concluída com IA" if not incompletas else f"Validação concluída parcialmente: {incompletas} rede(s) sem resultado; as demais foram salvas"
         }
 
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(
@@ -190,6 +289,9 @@ async def deletar_rede(rede_id: int, db: Session = Depends(get_db)):
                 detail=f"Rede social com ID {rede_id} não encontrada"
             )
         db.delete(rede)
+        if rede.validado:
+            registrar_redes_validadas(db, -1)
+            recalcular_engajamento(db, [rede.fan_id])
         db.commit()
 
         return {
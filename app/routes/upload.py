@@ -1,14 +1,17 @@
 from enum import EnumCheck
+import asyncio
 import os
 import shutil
 import uuid
-from fastapi import APIRouter, File, UploadFile, HTTPException, status, Form, Depends, Path
+from typing import List
+from fastapi import APIRouter, File, UploadFile, HTTPException, status, Form, Depends, Path, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import Documento, Fan
-import pytesseract
-from PIL import Image
-import pdf2image
+from app.models import Documento, Fan, JobDocumento
+from app.services.cache_ocr import estatisticas_cache, extrair_texto_com_cache_async
+from app.services.documento_validator import validate_document_text
+from app.services.fila_documentos import DOCUMENTOS_PENDENTES_FOLDER, enfileirar_documento, fila_documentos, remover_arquivo
 
 router = APIRouter()
 
@@ -23,50 +26,113 @@ ALLOWED_FILE_TYPES = [
     "application/pdf"
 ]
 
-@router.post("/upload/{fan_id}")
-async def upload_file(
-    fan_id: int = Path(..., example=1, description="ID do fã cadastrado anteriormente"),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    # Validação do tipo do arquivo upado
+# Limite por documento; o middleware aplica o mesmo valor ao corpo de /upload/{fan_id}
+UPLOAD_MAX_BYTES_DOCUMENTO = 1024 * 1024 * 2
+
+# Imagens acima deste tamanho são gravadas em disco antes do OCR; o padrão é metade do
+# limite por documento (valores a partir do limite deixam todas as imagens em memória)
+UPLOAD_MAX_BYTES_EM_MEMORIA = int(os.getenv("UPLOAD_MAX_BYTES_EM_MEMORIA", str(UPLOAD_MAX_BYTES_DOCUMENTO // 2)))
+
+MAX_ARQUIVOS_LOTE = 5
+
+def salvar_arquivo(file: UploadFile, caminho: str):
+    try:
+        with open(caminho, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao salvar o arquivo: {str(e)}"
+        )
+
+def validar_tipo_arquivo(file: UploadFile):
     if file.content_type not in ALLOWED_FILE_TYPES:
         raise HTTPException(
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             detail=f"Tipo de arquivo não suportado: {file.content_type}. Tipos permitidos: {', '.join(ALLOWED_FILE_TYPES)}"
         )
+
+def validar_tamanho_arquivo(file: UploadFile):
+    # No lote o middleware só limita o corpo inteiro; cada arquivo é conferido aqui
+    if file.size is not None and file.size > UPLOAD_MAX_BYTES_DOCUMENTO:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"O arquivo {file.filename} excede o tamanho máximo de {UPLOAD_MAX_BYTES_DOCUMENTO/1024/1024:.1f}MB por documento"
+        )
+
+def buscar_fan(db: Session, fan_id: int) -> Fan:
     fan = db.query(Fan).filter(Fan.id == fan_id).first()
     if not fan:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Fã com ID {fan_id} não encontrado"
         )
+    return fan
 
-    # Cria um nome único para o arquivo
+def nome_temporario(file: UploadFile) -> str:
     file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    temp_file_path = os.path.join(TEMP_UPLOAD_FOLDER, unique_filename)
+    return f"{uuid.uuid4()}{file_extension}"
 
-    # Salva o arquivo
-    try:
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Erro ao salvar o arquivo: {str(e)}"
+async def origem_do_upload(file: UploadFile):
+    # Imagens pequenas vão direto da memória para o OCR. PDFs sempre passam pelo disco: o poppler
+    # só lê arquivos, e um único arquivo serve para contar as páginas e para cada página
+    em_disco = file.content_type == "application/pdf" or (file.size is not None and file.size > UPLOAD_MAX_BYTES_EM_MEMORIA)
+    if em_disco:
+        temp_file_path = os.path.join(TEMP_UPLOAD_FOLDER, nome_temporario(file))
+        salvar_arquivo(file, temp_file_path)
+        return temp_file_path, temp_file_path
+    return await file.read(), None
+
+@router.post("/upload/{fan_id}")
+async def upload_file(
+    fan_id: int = Path(..., example=1, description="ID do fã cadastrado anteriormente"),
+    file: UploadFile = File(...),
+    assincrono: bool = Query(False, description="Processar o documento em segundo plano e responder 202 com o ID do job"),
+    db: Session = Depends(get_db)
+):
+    # Validação do tipo do arquivo upado
+    validar_tipo_arquivo(file)
+    fan = buscar_fan(db, fan_id)
+
+    if assincrono:
+        # A fila precisa do arquivo em disco até um worker processá-lo
+        caminho_pendente = os.path.join(DOCUMENTOS_PENDENTES_FOLDER, nome_temporario(file))
+        salvar_arquivo(file, caminho_pendente)
+        try:
+            job = enfileirar_documento(db, fan_id, file.filename, caminho_pendente, file.content_type)
+        except Exception as e:
+            os.remove(caminho_pendente)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Erro ao enfileirar o documento: {str(e)}"
+            )
+        fila_documentos.notificar()
+
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "job_id": job.id,
+                "status": job.status,
+                "fan_id": fan_id,
+                "filename": file.filename,
+                "status_url": f"/upload/jobs/{job.id}",
+                "mensagem": "Documento recebido e aguardando processamento"
+            }
         )
 
-    extracted_text = None
+    origem, temp_file_path = await origem_do_upload(file)
+
     try:
-        extracted_text = extract_text_from_file(temp_file_path, file.content_type)
+        # Reenvios do mesmo arquivo reaproveitam o texto já extraído
+        extracted_text = await extrair_texto_com_cache_async(db, origem, file.content_type)
     except Exception as e:
-        os.remove(temp_file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao processar o arquivo: {str(e)}"
         )
-
+    finally:
+        if temp_file_path:
+            remover_arquivo(temp_file_path)
 
     is_valid = validate_document_text(extracted_text, fan.nome)
 
@@ -82,18 +148,11 @@ async def upload_file(
         db.commit()
         db.refresh(new_doc)
     except Exception as e:
-        os.remove(temp_file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao registrar o documento: {str(e)}"
         )
 
-    try:
-        os.remove(temp_file_path)
-        print(f"Arquivo temporário removido: {temp_file_path}")
-    except Exception as e:
-        print(f"Erro ao remover o arquivo temporário: {str(e)}")
-
     return {
         "filename": file.filename,
         "content_type": file.content_type,
@@ -104,61 +163,119 @@ async def upload_file(
         "mensagem": "Documento validado com Sucesso!" if is_valid else "O documento não corresponde ao nome cadastrado"
     }
 
-def extract_text_from_file(temp_file_path, content_type):
-    pytesseract.pytesseract.tesseract_cmd = r'E:\Tesseract-OCR\tesseract.exe'
+@router.post("/upload/{fan_id}/batch")
+async def upload_lote(
+    fan_id: int = Path(..., example=1, description="ID do fã cadastrado anteriormente"),
+    files: List[UploadFile] = File(..., description="Documentos do fã (ex.: frente e verso do RG, comprovante de endereço)"),
+    db: Session = Depends(get_db)
+):
+    if len(files) > MAX_ARQUIVOS_LOTE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Envie no máximo {MAX_ARQUIVOS_LOTE} arquivos por lote"
+        )
+    for file in files:
+        validar_tipo_arquivo(file)
+        validar_tamanho_arquivo(file)
+    fan = buscar_fan(db, fan_id)
 
+    origens = []
     try:
-        if content_type.startswith("image/"):
-            img = Image.open(temp_file_path)
-
-            img = img.convert('L')
-
-            from PIL import ImageEnhance
-            enhancer = ImageEnhance.Contrast(img)
-            img = enhancer.enhance(2.0)
-
-            custom_config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
-            return pytesseract.image_to_string(img, lang='por', config=custom_config)
-
-        elif content_type == "application/pdf":
-            poppler_path = r'C:\Program Files\poppler-24.08.0\Library\bin'
-            images = pdf2image.convert_from_path(temp_file_path, poppler_path=poppler_path)
-            text = ""
-            for img in images:
-                text += pytesseract.image_to_string(img, lang='por')
-            return text
-        else:
-            return None
+        for file in files:
+            origens.append(await origem_do_upload(file))
+
+        # Todos os arquivos vão para o pool de OCR ao mesmo tempo
+        textos = await asyncio.gather(*[
+            extrair_texto_com_cache_async(db, origem, file.content_type)
+            for (origem, _), file in zip(origens, files)
+        ])
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Erro na extração de texto: {str(e)}")
-        return None
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao processar os arquivos: {str(e)}"
+        )
+    finally:
+        for _, temp_file_path in origens:
+            if temp_file_path:
+                remover_arquivo(temp_file_path)
 
-def validate_document_text(extracted_text, fan_name):
-    if not extracted_text or not fan_name:
-        return False
+    # O nome pode estar em qualquer um dos documentos (ex.: só na frente do RG);
+    # o lote_id permite refazer a validação pelo grupo (revalidar-documentos)
+    texto_combinado = "\n".join(texto for texto in textos if texto)
+    is_valid = validate_document_text(texto_combinado, fan.nome)
+    lote_id = str(uuid.uuid4())
 
-    import re
+    documentos = [
+        Documento(
+            fan_id=fan_id,
+            documento_nome=file.filename,
+            validado=is_valid,
+            texto_extraido=texto,
+            lote_id=lote_id
+        )
+        for file, texto in zip(files, textos)
+    ]
 
-    def normalize_text(text):
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', '', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+    try:
+        db.add_all(documentos)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao registrar os documentos: {str(e)}"
+        )
 
-    extracted_text = normalize_text(extracted_text)
-    fan_name = normalize_text(fan_name)
+    return {
+        "fan_id": fan_id,
+        "lote_id": lote_id,
+        "validado": is_valid,
+        "mensagem": "Documentos validados com Sucesso!" if is_valid else "Os documentos não correspondem ao nome cadastrado",
+        "arquivos": [
+            {
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "documento_id": documento.id,
+                "texto_extraido": texto,
+                "nome_encontrado": validate_document_text(texto, fan.nome)
+            }
+            for file, texto, documento in zip(files, textos, documentos)
+        ]
+    }
+
+@router.get("/upload/jobs/{job_id}")
+async def status_job_documento(job_id: str, db: Session = Depends(get_db)):
+    job = db.query(JobDocumento).filter(JobDocumento.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} não encontrado"
+        )
 
-    print(f"Texto extraído normalizado: {extracted_text}")
-    print(f"Nome do fã normalizado: {fan_name}")
+    resposta = {
+        "job_id": job.id,
+        "status": job.status,
+        "fan_id": job.fan_id,
+        "filename": job.documento_nome,
+        "tentativas": job.tentativas,
+        "erro": job.erro,
+        "criado_em": job.criado_em,
+        "atualizado_em": job.atualizado_em
+    }
 
-    if fan_name in extracted_text:
-        return True
+    if job.documento_id:
+        documento = db.query(Documento).filter(Documento.id == job.documento_id).first()
+        resposta.update({
+            "documento_id": documento.id,
+            "texto_extraido": documento.texto_extraido,
+            "validado": documento.validado,
+            "mensagem": "Documento validado com Sucesso!" if documento.validado else "O documento não corresponde ao nome cadastrado"
+        })
 
-    name_parts = fan_name.split()
-    matches = 0
-    for part in name_parts:
-        if len(part) > 2 and part in extracted_text:
-            matches += 1
-            print (f"Parte encontrada: {part}")
+    return resposta
 
-    return matches >= len(name_parts) / 2
\ No newline at end of file
+@router.get("/upload/cache")
+async def estatisticas_cache_ocr(db: Session = Depends(get_db)):
+    return estatisticas_cache(db)
@@ -1,18 +1,28 @@
 import spacy
+import os
 import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import re
-from typing import Dict, Callable, Optional
+from typing import Dict, Callable, List, Optional, Tuple
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 import time
 import logging
+import threading
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
+from app.services.driver_pool import DriverPool, DriverPoolEsgotado
+from app.services.metricas_extracao import metricas_extracao
+from app.services.cache_perfis import buscar_perfil, cabecalhos_condicionais, guardar_perfil, perfil_valido
+from app.database import SessionLocal
+from sqlalchemy.exc import SQLAlchemyError
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -31,6 +41,49 @@ except:
         raise
 
 
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+def caminho_chromedriver() -> str:
+    # ChromeDriverManager().install() consulta a versão e o cache a cada chamada; basta uma vez
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = ChromeDriverManager().install()
+        return _chromedriver_path
+
+# Páginas sem imagens, CSS e fontes: o texto do perfil continua no DOM e carrega bem mais rápido
+SELENIUM_PAGINAS_LEVES = os.getenv("SELENIUM_PAGINAS_LEVES", "1") != "0"
+URLS_BLOQUEADAS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.mp4", "*.webm",
+]
+
+# Limite para driver.get(); abaixo do REDES_TIMEOUT_POR_REDE (padrão 20 s), para uma página travada
+# não prender o navegador do pool (o padrão do Chrome é 300 s) depois que a validação já respondeu
+SELENIUM_TIMEOUT_PAGINA = float(os.getenv("SELENIUM_TIMEOUT_PAGINA", "10"))
+
+# Espera pelos seletores do perfil: intervalo curto entre verificações e limite para o conteúdo dinâmico
+INTERVALO_ESPERA = 0.2
+TIMEOUT_CONTEUDO_DINAMICO = 3
+
+def bloquear_recursos_pesados(driver):
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": URLS_BLOQUEADAS})
+    except Exception as e:
+        logger.warning(f"Não foi possível bloquear recursos via CDP: {str(e)}")
+
+def esperar_algum(driver, seletores, timeout: float) -> bool:
+    # Retorna assim que qualquer um dos seletores aparece, em vez de dormir um tempo fixo
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=INTERVALO_ESPERA).until(
+            EC.any_of(*[EC.presence_of_element_located(seletor) for seletor in seletores])
+        )
+        return True
+    except TimeoutException:
+        return False
+
 # Configuração do Selenium
 def criar_driver():
     options = Options()
@@ -41,9 +94,21 @@ def criar_driver():
     options.add_argument('--window-size=1920,1080')
     options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
 
+    if SELENIUM_PAGINAS_LEVES:
+        # Devolve o controle no DOMContentLoaded, sem esperar imagens e folhas de estilo
+        options.page_load_strategy = "eager"
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.stylesheets": 2,
+            "profile.managed_default_content_settings.fonts": 2,
+        })
+
     try:
-        service = Service(ChromeDriverManager().install())
+        service = Service(caminho_chromedriver())
         driver = webdriver.Chrome(service=service,options=options)
+        driver.set_page_load_timeout(SELENIUM_TIMEOUT_PAGINA)
+        if SELENIUM_PAGINAS_LEVES:
+            bloquear_recursos_pesados(driver)
         return driver
     except Exception as e:
         logger.error(f"Erro ao criar driver Selenium: {str(e)}")
@@ -54,16 +119,18 @@ def extrair_instagram_selenium(driver, url):
     try:
         driver.get(url)
         # Aguardar carregamento da página
-        WebDriverWait(driver, 10).until(
+        WebDriverWait(driver, 10, poll_frequency=INTERVALO_ESPERA).until(
             EC.presence_of_element_located((By.TAG_NAME, "main"))
         )
-        # Dar tempo para carregar conteúdo dinâmico
-        time.sleep(3)
+        # Aguardar o conteúdo dinâmico (bio ou legendas)
+        seletor_bio = (By.XPATH, "//header//div[contains(@class, 'bio')]")
+        seletor_posts = (By.XPATH, "//article//div[contains(@class, 'caption')]")
+        esperar_algum(driver, [seletor_bio, seletor_posts], TIMEOUT_CONTEUDO_DINAMICO)
 
         # Extrair bio
-        bio_elements = driver.find_elements(By.XPATH, "//header//div[contains(@class, 'bio')]")
+        bio_elements = driver.find_elements(*seletor_bio)
         # Extrair posts (legendas)
-        post_elements = driver.find_elements(By.XPATH, "//article//div[contains(@class, 'caption')]")
+        post_elements = driver.find_elements(*seletor_posts)
 
         textos = []
         for elem in bio_elements:
@@ -84,16 +151,18 @@ def extrair_twitter_selenium(driver, url):
     try:
         driver.get(url)
         # Aguardar carregamento da página
-        WebDriverWait(driver, 10).until(
+        WebDriverWait(driver, 10, poll_frequency=INTERVALO_ESPERA).until(
             EC.presence_of_element_located((By.TAG_NAME, "article"))
         )
-        # Dar tempo para carregar conteúdo dinâmico
-        time.sleep(3)
+        # Aguardar o conteúdo dinâmico (bio ou texto dos tweets)
+        seletor_bio = (By.XPATH, "//div[@data-testid='UserDescription']")
+        seletor_tweets = (By.XPATH, "//article//div[@data-testid='tweetText']")
+        esperar_algum(driver, [seletor_bio, seletor_tweets], TIMEOUT_CONTEUDO_DINAMICO)
 
         # Extrair bio
-        bio_elements = driver.find_elements(By.XPATH, "//div[@data-testid='UserDescription']")
+        bio_elements = driver.find_elements(*seletor_bio)
         # Extrair tweets
-        tweet_elements = driver.find_elements(By.XPATH, "//article//div[@data-testid='tweetText']")
+        tweet_elements = driver.find_elements(*seletor_tweets)
 
         textos = []
         for elem in bio_elements:
@@ -114,7 +183,7 @@ def extrair_steam_selenium(driver, url):
     try:
         driver.get(url)
         # Aguardar carregamento da página
-        WebDriverWait(driver, 10).until(
+        WebDriverWait(driver, 10, poll_frequency=INTERVALO_ESPERA).until(
             EC.presence_of_element_located((By.CLASS_NAME, "profile_page"))
         )
 
@@ -142,7 +211,7 @@ def extrair_gamersclub_selenium(driver, url):
     try:
         driver.get(url)
         # Aguardar carregamento da página
-        WebDriverWait(driver, 10).until(
+        WebDriverWait(driver, 10, poll_frequency=INTERVALO_ESPERA).until(
             EC.presence_of_element_located((By.CLASS_NAME, "player-info"))
         )
 
@@ -221,57 +290,152 @@ SELENIUM_EXTRATORES: Dict[str, Callable[[webdriver.Chrome, str], str]] = {
     "gamersclub": extrair_gamersclub_selenium
 }
 
-def extrair_conteudo_do_perfil(link: str, tipo_rede: str) -> str:
-    logger.info(f"Iniciando extração de conteúdo para {tipo_rede}: {link}")
+# Navegadores reaproveitados entre as extrações
+pool_drivers = DriverPool(criar_driver)
 
-    # Primeiro, tentar com Selenium
-    try:
-        driver = criar_driver()
-        if driver:
-            logger.info(f"Usando Selenium para extrair conteúdo de {tipo_rede}")
-            extrator_selenium = SELENIUM_EXTRATORES.get(tipo_rede)
-            if extrator_selenium:
-                conteudo = extrator_selenium(driver, link)
-                driver.quit()
-                if conteudo:
-                    logger.info(f"Extração com Selenium bem-sucedida para {tipo_rede}")
-                    return conteudo
-            driver.quit()
-    except Exception as e:
-        logger.error(f"Erro ao usar Selenium: {str(e)}")
-        if 'driver' in locals() and driver:
-            driver.quit()
+HEADERS_HTTP = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+HTTP_TIMEOUT = 10
+
+def criar_sessao_http() -> requests.Session:
+    # Conexões keep-alive reaproveitadas entre perfis (e entre threads da validação)
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    sessao.headers.update(HEADERS_HTTP)
+    # Só o pool de conexões é compartilhado: cookies de um site ou perfil nunca vão para o próximo
+    sessao.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return sessao
+
+sessao_http = criar_sessao_http()
+
+# Ordem das camadas por rede: Steam e Gamers Club entregam o perfil no HTML estático;
+# Instagram e Twitter montam a página com JavaScript, então o navegador vem primeiro
+POLITICAS_EXTRACAO: Dict[str, List[str]] = {
+    "steam": ["http", "selenium"],
+    "gamersclub": ["http", "selenium"],
+    "instagram": ["selenium", "http"],
+    "twitter": ["selenium", "http"],
+}
+POLITICA_PADRAO = ["http", "selenium"]
+
+# Abaixo disso o texto específico do perfil é considerado insuficiente e a próxima camada é tentada
+MIN_CARACTERES_CONTEUDO = int(os.getenv("MIN_CARACTERES_CONTEUDO", "80"))
+
+def conteudo_suficiente(conteudo: str) -> bool:
+    return len((conteudo or "").strip()) >= MIN_CARACTERES_CONTEUDO
+
+def textos_do_html(html: str, tipo_rede: str) -> Tuple[str, str]:
+    # (texto dos seletores da rede, texto genérico da página)
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.extract()
+
+    extrator = EXTRATORES.get(tipo_rede)
+    especifico = extrator(soup) if extrator else ""
+    return especifico, soup.get_text(separator=' ', strip=True)[:5000]
+
+class PerfilNaoModificado(Exception):
+    # 304 na requisição condicional: o texto guardado no cache continua valendo
+    pass
+
+def extrair_com_http(link: str, tipo_rede: str, condicionais: Dict[str, str]) -> Tuple[str, str, Dict]:
+    response = sessao_http.get(link, timeout=HTTP_TIMEOUT, headers=condicionais)
+    if response.status_code == 304 and condicionais:
+        raise PerfilNaoModificado()
+    if response.status_code != 200:
+        logger.warning(f"Status code não-200 recebido: {response.status_code}")
+        return "", "", {}
+    if "charset" not in response.headers.get("content-type", "").lower():
+        # Sem charset no cabeçalho o requests assume ISO-8859-1; detecta pelo conteúdo
+        response.encoding = response.apparent_encoding
+    especifico, generico = textos_do_html(response.text, tipo_rede)
+    validadores = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    return especifico, generico, validadores
+
+def extrair_com_selenium(link: str, tipo_rede: str, condicionais: Dict[str, str]) -> Tuple[str, str, Dict]:
+    # O navegador não faz requisições condicionais; o texto vindo dele é guardado sem validadores
+    extrator_selenium = SELENIUM_EXTRATORES.get(tipo_rede)
+    if not extrator_selenium:
+        return "", "", {}
+    with pool_drivers.driver() as driver:
+        conteudo = extrator_selenium(driver, link)
+    # Em caso de erro os extratores devolvem o HTML da página
+    if conteudo and conteudo.lstrip().startswith("<"):
+        return (*textos_do_html(conteudo, tipo_rede), {})
+    return conteudo, conteudo, {}
+
+# Cada camada recebe os cabeçalhos condicionais da entrada do cache e devolve
+# (texto específico, texto genérico, validadores HTTP da resposta)
+CAMADAS_EXTRACAO: Dict[str, Callable[[str, str, Dict[str, str]], Tuple[str, str, Dict]]] = {
+    "http": extrair_com_http,
+    "selenium": extrair_com_selenium,
+}
 
-    # Fallback para BeautifulSoup
-    logger.info(f"Usando BeautifulSoup como fallback para {tipo_rede}")
+def guardar_no_cache_de_perfis(db, link: str, conteudo: str, validadores: Dict):
+    # Falha no cache não impede a validação
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(link, headers=headers, timeout=10)
-        if response.status_code != 200:
-            logger.warning(f"Status code não-200 recebido: {response.status_code}")
-            return ""
+        guardar_perfil(db, link, conteudo, **validadores)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.warning(f"Erro ao guardar o perfil no cache: {str(e)}")
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        for script in soup(["script", "style"]):
-            script.extract()
-
-        extrator = EXTRATORES.get(tipo_rede)
-        if extrator:
-            conteudo = extrator(soup)
-            if conteudo:
-                logger.info(f"Extração com BeautifulSoup bem-sucedida para {tipo_rede}")
-                return conteudo
-
-        # Extração genérica como último recurso
-        logger.info("Usando extração genérica de texto")
-        return soup.get_text(separator=' ', strip=True)[:5000]
+def extrair_conteudo_do_perfil(link: str, tipo_rede: str) -> str:
+    # Roda nas threads da validação de redes, com uma sessão própria para o cache
+    with SessionLocal() as db:
+        return extrair_conteudo_com_cache(db, link, tipo_rede)
 
-    except Exception as e:
-        logger.error(f"Erro ao extrair conteúdo com BeautifulSoup: {str(e)}")
-        return ""
+def extrair_conteudo_com_cache(db, link: str, tipo_rede: str) -> str:
+    logger.info(f"Iniciando extração de conteúdo para {tipo_rede}: {link}")
+    inicio_perfil = time.perf_counter()
+
+    entrada = buscar_perfil(db, link)
+    if entrada is not None and perfil_valido(entrada):
+        logger.info(f"Conteúdo de {tipo_rede} dentro do TTL do cache, sem acessar o perfil")
+        metricas_extracao.registrar(tipo_rede, "cache", time.perf_counter() - inicio_perfil, True)
+        return entrada.conteudo
+
+    condicionais = cabecalhos_condicionais(entrada)
+    camadas = POLITICAS_EXTRACAO.get(tipo_rede, POLITICA_PADRAO)
+    if condicionais:
+        # Entrada vencida com ETag/Last-Modified: tenta primeiro a requisição condicional
+        camadas = ["http"] + [camada for camada in camadas if camada != "http"]
+
+    generico = ""
+    for camada in camadas:
+        inicio = time.perf_counter()
+        erro = False
+        conteudo, validadores = "", {}
+        try:
+            conteudo, texto_pagina, validadores = CAMADAS_EXTRACAO[camada](link, tipo_rede, condicionais)
+            generico = generico or texto_pagina
+        except PerfilNaoModificado:
+            logger.info(f"Perfil de {tipo_rede} não mudou desde a última extração (304)")
+            conteudo = entrada.conteudo
+            validadores = {"etag": entrada.etag, "last_modified": entrada.last_modified}
+        except DriverPoolEsgotado as e:
+            erro = True
+            logger.warning(f"Selenium indisponível: {str(e)}")
+        except Exception as e:
+            erro = True
+            logger.error(f"Erro na extração via {camada} para {tipo_rede}: {str(e)}")
+
+        suficiente = conteudo_suficiente(conteudo)
+        metricas_extracao.registrar(tipo_rede, camada, time.perf_counter() - inicio, suficiente, erro)
+        if suficiente:
+            logger.info(f"Extração via {camada} bem-sucedida para {tipo_rede}")
+            guardar_no_cache_de_perfis(db, link, conteudo, validadores)
+            metricas_extracao.registrar(tipo_rede, "perfil", time.perf_counter() - inicio_perfil, True)
+            return conteudo
+        logger.info(f"Conteúdo insuficiente via {camada} para {tipo_rede}, tentando a próxima camada")
+
+    # Extração genérica como último recurso
+    logger.info("Usando extração genérica de texto")
+    metricas_extracao.registrar(tipo_rede, "perfil", time.perf_counter() - inicio_perfil, False)
+    return generico
 
 def validar_conteudo_com_ia(conteudo: str, interesses: list) -> dict:
     if not conteudo:
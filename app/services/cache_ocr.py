@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models import CacheOcr
+from app.services.ocr import OrigemArquivo, assinatura_ocr, extrair_texto, extrair_texto_async
+
+logger = logging.getLogger(__name__)
+
+# Limites do cache; as entradas acessadas há mais tempo saem primeiro
+CACHE_OCR_MAX_ENTRADAS = int(os.getenv("CACHE_OCR_MAX_ENTRADAS", "5000"))
+CACHE_OCR_MAX_BYTES = int(os.getenv("CACHE_OCR_MAX_BYTES", str(50 * 1024 * 1024)))
+
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+_contadores = {"acertos": 0, "falhas": 0}
+_contadores_lock = threading.Lock()
+
+def contar(evento: str):
+    with _contadores_lock:
+        _contadores[evento] += 1
+
+def chave_cache(origem: OrigemArquivo, content_type: str) -> str:
+    sha = hashlib.sha256(assinatura_ocr(content_type).encode("utf-8") + b"\0")
+    if isinstance(origem, bytes):
+        sha.update(origem)
+    else:
+        with open(origem, "rb") as arquivo:
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b""):
+                sha.update(bloco)
+    return sha.hexdigest()
+
+def buscar_no_cache(db: Session, chave: str) -> Optional[str]:
+    entrada = db.query(CacheOcr).filter(CacheOcr.chave == chave).first()
+    if entrada is None:
+        contar("falhas")
+        return None
+
+    contar("acertos")
+    entrada.acessado_em = datetime.utcnow()
+    return entrada.texto_extraido
+
+def guardar_no_cache(db: Session, chave: str, texto: str):
+    agora = datetime.utcnow()
+    stmt = sqlite_insert(CacheOcr).values(
+        chave=chave,
+        texto_extraido=texto,
+        tamanho=len(texto.encode("utf-8")),
+        criado_em=agora,
+        acessado_em=agora
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["chave"],
+        set_={"texto_extraido": stmt.excluded.texto_extraido, "tamanho": stmt.excluded.tamanho, "acessado_em": agora}
+    ))
+    remover_excedentes(db)
+
+def remover_excedentes(db: Session):
+    # LRU: mantém as entradas mais recentes enquanto couberem nos limites de quantidade e tamanho
+    db.execute(
+        text(
+            "DELETE FROM cache_ocr WHERE chave IN ("
+            "  SELECT chave FROM ("
+            "    SELECT chave,"
+            "      ROW_NUMBER() OVER (ORDER BY acessado_em DESC) AS posicao,"
+            "      SUM(tamanho) OVER (ORDER BY acessado_em DESC ROWS UNBOUNDED PRECEDING) AS acumulado"
+            "    FROM cache_ocr"
+            "  ) WHERE posicao > :max_entradas OR acumulado > :max_bytes"
+            ")"
+        ),
+        {"max_entradas": CACHE_OCR_MAX_ENTRADAS, "max_bytes": CACHE_OCR_MAX_BYTES}
+    )
+
+def extrair_texto_com_cache(db: Session, origem: OrigemArquivo, content_type: str, levantar: bool = False) -> Optional[str]:
+    # A gravação no cache entra na transação de quem chamou
+    chave = chave_cache(origem, content_type)
+    texto = buscar_no_cache(db, chave)
+    if texto is not None:
+        return texto
+
+    texto = extrair_texto(origem, content_type, levantar=levantar)
+    if texto is not None:
+        guardar_no_cache(db, chave, texto)
+    return texto
+
+async def extrair_texto_com_cache_async(db: Session, origem: OrigemArquivo, content_type: str) -> Optional[str]:
+    chave = chave_cache(origem, content_type)
+    texto = buscar_no_cache(db, chave)
+    if texto is not None:
+        return texto
+
+    texto = await extrair_texto_async(origem, content_type)
+    if texto is not None:
+        guardar_no_cache(db, chave, texto)
+    return texto
+
+def estatisticas_cache(db: Session) -> Dict:
+    with _contadores_lock:
+        acertos, falhas = _contadores["acertos"], _contadores["falhas"]
+    entradas, tamanho = db.query(func.count(CacheOcr.chave), func.coalesce(func.sum(CacheOcr.tamanho), 0)).one()
+    consultas = acertos + falhas
+    return {
+        "acertos": acertos,
+        "falhas": falhas,
+        "taxa_acerto": round(acertos / consultas, 4) if consultas else None,
+        "entradas": entradas,
+        "bytes": tamanho,
+        "max_entradas": CACHE_OCR_MAX_ENTRADAS,
+        "max_bytes": CACHE_OCR_MAX_BYTES
+    }
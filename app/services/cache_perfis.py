@@ -0,0 +1,64 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models import CachePerfil
+
+# Dentro do TTL o texto guardado é usado sem acessar a rede; depois disso, a entrada é revalidada
+CACHE_PERFIS_TTL = int(os.getenv("CACHE_PERFIS_TTL", str(6 * 60 * 60)))
+CACHE_PERFIS_MAX_ENTRADAS = int(os.getenv("CACHE_PERFIS_MAX_ENTRADAS", "10000"))
+
+def normalizar_link(link: str) -> str:
+    # Os identificadores das redes suportadas não diferenciam maiúsculas; http/https, www. e barra final também não importam
+    partes = urlsplit(link.strip().lower())
+    host = partes.netloc[4:] if partes.netloc.startswith("www.") else partes.netloc
+    return f"https://{host}{partes.path.rstrip('/')}"
+
+def buscar_perfil(db: Session, link: str) -> Optional[CachePerfil]:
+    return db.query(CachePerfil).filter(CachePerfil.link == normalizar_link(link)).first()
+
+def perfil_valido(entrada: CachePerfil) -> bool:
+    return datetime.utcnow() - entrada.buscado_em < timedelta(seconds=CACHE_PERFIS_TTL)
+
+def cabecalhos_condicionais(entrada: Optional[CachePerfil]) -> Dict[str, str]:
+    if entrada is None:
+        return {}
+    cabecalhos = {}
+    if entrada.etag:
+        cabecalhos["If-None-Match"] = entrada.etag
+    if entrada.last_modified:
+        cabecalhos["If-Modified-Since"] = entrada.last_modified
+    return cabecalhos
+
+def guardar_perfil(db: Session, link: str, conteudo: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+    stmt = sqlite_insert(CachePerfil).values(
+        link=normalizar_link(link),
+        conteudo=conteudo,
+        etag=etag,
+        last_modified=last_modified,
+        buscado_em=datetime.utcnow()
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["link"],
+        set_={
+            "conteudo": stmt.excluded.conteudo,
+            "etag": stmt.excluded.etag,
+            "last_modified": stmt.excluded.last_modified,
+            "buscado_em": stmt.excluded.buscado_em
+        }
+    ))
+    remover_excedentes(db)
+
+def remover_excedentes(db: Session):
+    # Mantém as entradas buscadas mais recentemente
+    db.execute(
+        text(
+            "DELETE FROM cache_perfis WHERE link IN ("
+            "  SELECT link FROM cache_perfis ORDER BY buscado_em DESC LIMIT -1 OFFSET :max_entradas"
+            ")"
+        ),
+        {"max_entradas": CACHE_PERFIS_MAX_ENTRADAS}
+    )
@@ -0,0 +1,33 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+def validate_document_text(extracted_text, fan_name):
+    if not extracted_text or not fan_name:
+        return False
+
+    import re
+
+    def normalize_text(text):
+        text = text.lower()
+        text = re.sub(r'[^\w\s]', '', text)
+        text = re.sub(r'\s+', ' ', text).strip()
+        return text
+
+    extracted_text = normalize_text(extracted_text)
+    fan_name = normalize_text(fan_name)
+
+    logger.debug(f"Texto extraído normalizado: {extracted_text}")
+    logger.debug(f"Nome do fã normalizado: {fan_name}")
+
+    if fan_name in extracted_text:
+        return True
+
+    name_parts = fan_name.split()
+    matches = 0
+    for part in name_parts:
+        if len(part) > 2 and part in extracted_text:
+            matches += 1
+            logger.debug(f"Parte encontrada: {part}")
+
+    return matches >= len(name_parts) / 2
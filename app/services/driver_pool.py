@@ -0,0 +1,146 @@
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from selenium.common.exceptions import WebDriverException
+
+logger = logging.getLogger(__name__)
+
+DRIVER_POOL_TAMANHO = int(os.getenv("DRIVER_POOL_TAMANHO", "2"))
+DRIVER_POOL_AQUECIDOS = int(os.getenv("DRIVER_POOL_AQUECIDOS", "1"))
+DRIVER_POOL_MAX_PAGINAS = int(os.getenv("DRIVER_POOL_MAX_PAGINAS", "50"))
+DRIVER_POOL_TIMEOUT = float(os.getenv("DRIVER_POOL_TIMEOUT", "30"))
+
+class DriverPoolEsgotado(Exception):
+    pass
+
+class DriverPool:
+    # Navegadores abertos uma vez e reaproveitados entre perfis; no máximo `tamanho` ao mesmo tempo
+    def __init__(
+        self,
+        fabrica: Callable,
+        tamanho: int = DRIVER_POOL_TAMANHO,
+        max_paginas: int = DRIVER_POOL_MAX_PAGINAS,
+        timeout: float = DRIVER_POOL_TIMEOUT
+    ):
+        self._fabrica = fabrica
+        self.tamanho = tamanho
+        self.max_paginas = max_paginas
+        self.timeout = timeout
+        # LIFO: o driver usado por último (mais "quente") sai primeiro
+        self._livres: queue.LifoQueue = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._paginas: Dict[int, int] = {}
+        self._em_criacao = 0
+        self._lock = threading.Lock()
+        self._fechado = False
+
+    def _criar(self):
+        with self._lock:
+            self._em_criacao += 1
+        driver = None
+        try:
+            driver = self._fabrica()
+            if driver is None:
+                raise WebDriverException("Não foi possível iniciar o navegador")
+        finally:
+            with self._lock:
+                self._em_criacao -= 1
+                if driver is not None:
+                    self._paginas[id(driver)] = 0
+        logger.info("Novo navegador iniciado no pool")
+        return driver
+
+    def _total(self) -> int:
+        # Navegadores abertos mais os que ainda estão subindo
+        with self._lock:
+            return len(self._paginas) + self._em_criacao
+
+    def _encerrar_driver(self, driver):
+        with self._lock:
+            self._paginas.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Erro ao encerrar navegador: {str(e)}")
+
+    def _resetar(self, driver):
+        # Limpa cookies de todos os domínios (não só do atual) e sai da página anterior
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except Exception:
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def aquecer(self, quantidade: int = DRIVER_POOL_AQUECIDOS):
+        # Abre navegadores antes do primeiro pedido. Cada um ocupa uma vaga enquanto é criado,
+        # então pedidos que chegam durante o aquecimento não fazem o pool passar do tamanho
+        while not self._fechado and self._total() < min(quantidade, self.tamanho):
+            if not self._vagas.acquire(blocking=False):
+                return
+            try:
+                self._livres.put(self._criar())
+            except Exception as e:
+                logger.error(f"Erro ao aquecer o pool de navegadores: {str(e)}")
+                return
+            finally:
+                self._vagas.release()
+
+    def adquirir(self, timeout: Optional[float] = None):
+        if self._fechado:
+            raise DriverPoolEsgotado("Pool de navegadores encerrado")
+        timeout = self.timeout if timeout is None else timeout
+        if not self._vagas.acquire(timeout=timeout):
+            raise DriverPoolEsgotado(f"Nenhum navegador livre em {timeout}s")
+        try:
+            try:
+                return self._livres.get_nowait()
+            except queue.Empty:
+                return self._criar()
+        except Exception:
+            self._vagas.release()
+            raise
+
+    def devolver(self, driver, descartar: bool = False):
+        try:
+            with self._lock:
+                paginas = self._paginas.get(id(driver), 0) + 1
+                self._paginas[id(driver)] = paginas
+
+            if descartar or self._fechado or paginas >= self.max_paginas:
+                self._encerrar_driver(driver)
+                return
+
+            try:
+                self._resetar(driver)
+            except Exception as e:
+                logger.warning(f"Navegador descartado ao resetar: {str(e)}")
+                self._encerrar_driver(driver)
+                return
+            self._livres.put(driver)
+        finally:
+            self._vagas.release()
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        driver = self.adquirir(timeout)
+        descartar = False
+        try:
+            yield driver
+        except WebDriverException:
+            # Navegador travado ou fechado: não volta para o pool
+            descartar = True
+            raise
+        finally:
+            self.devolver(driver, descartar)
+
+    def encerrar(self):
+        self._fechado = True
+        while True:
+            try:
+                driver = self._livres.get_nowait()
+            except queue.Empty:
+                return
+            self._encerrar_driver(driver)
@@ -0,0 +1,65 @@
+from typing import List, Optional
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+from app.models import Fan, RedeSocial, Tag, fan_tags
+from app.services.estatisticas import incrementar
+
+PONTOS_ENGAJAMENTO_ALTO = 5
+PONTOS_ENGAJAMENTO_MEDIO = 2
+
+NIVEIS_ENGAJAMENTO = {
+    "alto": "Alto",
+    "médio": "Médio",
+    "medio": "Médio",
+    "baixo": "Baixo",
+}
+
+def engajamento_sql(pontos):
+    # Nível pelos pontos; única definição da regra, usada para materializar fans.engajamento
+    return case(
+        (pontos >= PONTOS_ENGAJAMENTO_ALTO, "Alto"),
+        (pontos >= PONTOS_ENGAJAMENTO_MEDIO, "Médio"),
+        else_="Baixo"
+    )
+
+def pontos_sql():
+    # Pontos de cada fã (redes validadas * 2 + eventos + compras), correlacionado a Fan.id
+    redes_validadas = select(func.count(RedeSocial.id)).where(
+        RedeSocial.fan_id == Fan.id,
+        RedeSocial.validado == True
+    ).scalar_subquery()
+
+    eventos_compras = select(func.count()).select_from(fan_tags).join(
+        Tag, Tag.id == fan_tags.c.tag_id
+    ).where(
+        fan_tags.c.fan_id == Fan.id,
+        Tag.categoria.in_(["evento", "compra"])
+    ).scalar_subquery()
+
+    return redes_validadas * 2 + eventos_compras
+
+def _contar_niveis(db: Session, filtro) -> dict:
+    linhas = db.query(Fan.engajamento, func.count(Fan.id)).filter(*filtro).group_by(Fan.engajamento).all()
+    return {nivel: total for nivel, total in linhas}
+
+def recalcular_engajamento(db: Session, fan_ids: Optional[List[int]] = None):
+    # Recalcula pontos/engajamento dos fãs informados (ou de todos) e ajusta os
+    # contadores por nível na mesma transação
+    db.flush()
+    filtro = [Fan.id.in_(fan_ids)] if fan_ids is not None else []
+
+    antes = _contar_niveis(db, filtro)
+    db.execute(
+        update(Fan).where(*filtro).values(pontos=pontos_sql()),
+        execution_options={"synchronize_session": False}
+    )
+    db.execute(
+        update(Fan).where(*filtro).values(engajamento=engajamento_sql(Fan.pontos)),
+        execution_options={"synchronize_session": False}
+    )
+    depois = _contar_niveis(db, filtro)
+
+    incrementar(db, [
+        ("engajamento", nivel, depois.get(nivel, 0) - antes.get(nivel, 0))
+        for nivel in set(antes) | set(depois)
+    ])
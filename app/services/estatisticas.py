@@ -0,0 +1,85 @@
+import logging
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models import Estatistica, Fan, RedeSocial, Tag, fan_tags
+from app.services.tags import normalizar_tags
+
+logger = logging.getLogger(__name__)
+
+CATEGORIA_GERAL = "geral"
+
+def incrementar(db: Session, deltas: Iterable[Tuple[str, str, int]]):
+    # Soma (categoria, nome, delta) aos contadores, criando os que não existem
+    linhas = [
+        {"categoria": categoria, "nome": nome, "valor": delta}
+        for categoria, nome, delta in deltas
+        if delta
+    ]
+    if not linhas:
+        return
+
+    stmt = sqlite_insert(Estatistica)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["categoria", "nome"],
+        set_={"valor": Estatistica.valor + stmt.excluded.valor}
+    )
+    db.execute(stmt, linhas)
+
+def registrar_fans(db: Session, tags_por_fan: List[Dict[str, Iterable[str]]]):
+    # Atualiza os contadores para fãs recém-cadastrados (mesma transação do cadastro)
+    # Todo fã nasce com engajamento "Baixo"; recalcular_engajamento ajusta em seguida
+    deltas: Dict[Tuple[str, str], int] = {
+        (CATEGORIA_GERAL, "total_fans"): len(tags_por_fan),
+        ("engajamento", "Baixo"): len(tags_por_fan),
+    }
+    for tags_por_categoria in tags_por_fan:
+        for categoria, nomes in tags_por_categoria.items():
+            for nome in normalizar_tags(nomes):
+                deltas[(categoria, nome)] = deltas.get((categoria, nome), 0) + 1
+
+    incrementar(db, ((categoria, nome, delta) for (categoria, nome), delta in deltas.items()))
+
+def registrar_redes_validadas(db: Session, delta: int):
+    incrementar(db, [(CATEGORIA_GERAL, "redes_validadas", delta)])
+
+def ler_totais(db: Session) -> Dict[str, int]:
+    linhas = db.query(Estatistica.nome, Estatistica.valor).filter(
+        Estatistica.categoria == CATEGORIA_GERAL
+    ).all()
+    return {nome: valor for nome, valor in linhas}
+
+def ler_top(db: Session, categoria: str, limite: int = 5) -> List[Tuple[str, int]]:
+    # Percorre apenas as N primeiras entradas do índice (categoria, valor)
+    linhas = db.query(Estatistica.nome, Estatistica.valor).filter(
+        Estatistica.categoria == categoria,
+        Estatistica.valor > 0
+    ).order_by(Estatistica.valor.desc(), Estatistica.nome).limit(limite).all()
+    return [(nome, valor) for nome, valor in linhas]
+
+def reconstruir_estatisticas(db: Session):
+    # Recalcula todos os contadores a partir das tabelas de origem
+    db.query(Estatistica).delete()
+
+    db.execute(insert(Estatistica).from_select(
+        ["categoria", "nome", "valor"],
+        select(Tag.categoria, Tag.nome, func.count(fan_tags.c.fan_id)).join(
+            fan_tags, fan_tags.c.tag_id == Tag.id
+        ).group_by(Tag.id)
+    ))
+    db.execute(insert(Estatistica).from_select(
+        ["categoria", "nome", "valor"],
+        select(literal("engajamento"), Fan.engajamento, func.count(Fan.id)).group_by(Fan.engajamento)
+    ))
+
+    total_fans = db.query(func.count(Fan.id)).scalar() or 0
+    redes_validadas = db.query(func.count(RedeSocial.id)).filter(
+        RedeSocial.validado == True
+    ).scalar() or 0
+    incrementar(db, [
+        (CATEGORIA_GERAL, "total_fans", total_fans),
+        (CATEGORIA_GERAL, "redes_validadas", redes_validadas),
+    ])
+
+    logger.info(f"Estatísticas reconstruídas: {total_fans} fãs, {redes_validadas} redes validadas")
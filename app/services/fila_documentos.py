@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Documento, Fan, JobDocumento
+from app.services.documento_validator import validate_document_text
+from app.services.cache_ocr import extrair_texto_com_cache
+
+logger = logging.getLogger(__name__)
+
+# Arquivos aguardando processamento ficam em disco até o job terminar
+DOCUMENTOS_PENDENTES_FOLDER = "documentos_pendentes"
+
+FILA_DOCUMENTOS_WORKERS = int(os.getenv("FILA_DOCUMENTOS_WORKERS", "2"))
+FILA_DOCUMENTOS_MAX_TENTATIVAS = int(os.getenv("FILA_DOCUMENTOS_MAX_TENTATIVAS", "3"))
+FILA_DOCUMENTOS_INTERVALO = float(os.getenv("FILA_DOCUMENTOS_INTERVALO", "1.0"))
+
+def enfileirar_documento(db: Session, fan_id: int, documento_nome: str, caminho_arquivo: str, content_type: str) -> JobDocumento:
+    agora = datetime.utcnow()
+    job = JobDocumento(
+        id=str(uuid.uuid4()),
+        fan_id=fan_id,
+        documento_nome=documento_nome,
+        caminho_arquivo=caminho_arquivo,
+        content_type=content_type,
+        status="pendente",
+        tentativas=0,
+        max_tentativas=FILA_DOCUMENTOS_MAX_TENTATIVAS,
+        disponivel_em=agora,
+        criado_em=agora,
+        atualizado_em=agora
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+def reservar_proximo_job(db: Session) -> Optional[str]:
+    # UPDATE ... RETURNING é atômico no SQLite: dois workers nunca pegam o mesmo job
+    agora = datetime.utcnow()
+    job_id = db.execute(
+        text(
+            "UPDATE jobs_documentos "
+            "SET status = 'processando', tentativas = tentativas + 1, atualizado_em = :agora "
+            "WHERE id = ("
+            "  SELECT id FROM jobs_documentos "
+            "  WHERE status = 'pendente' AND disponivel_em <= :agora "
+            "  ORDER BY disponivel_em LIMIT 1"
+            ") RETURNING id"
+        ),
+        {"agora": agora}
+    ).scalar()
+    db.commit()
+    return job_id
+
+def remover_arquivo(caminho: str):
+    try:
+        os.remove(caminho)
+    except OSError as e:
+        logger.warning(f"Erro ao remover o arquivo {caminho}: {str(e)}")
+
+def processar_job(job_id: str):
+    db = SessionLocal()
+    try:
+        job = db.query(JobDocumento).filter(JobDocumento.id == job_id).first()
+        fan = db.query(Fan).filter(Fan.id == job.fan_id).first()
+
+        if not fan:
+            # Não adianta repetir: o job falha na hora
+            job.status = "erro"
+            job.erro = f"Fã com ID {job.fan_id} não encontrado"
+            job.atualizado_em = datetime.utcnow()
+            db.commit()
+            remover_arquivo(job.caminho_arquivo)
+            logger.error(f"Job {job_id} falhou definitivamente: {job.erro}")
+            return
+
+        try:
+            # O OCR roda no pool de processos; esta thread só espera o resultado.
+            # Falhas do OCR levantam exceção e caem nas novas tentativas abaixo
+            extracted_text = extrair_texto_com_cache(db, job.caminho_arquivo, job.content_type, levantar=True)
+            is_valid = validate_document_text(extracted_text, fan.nome)
+
+            documento = Documento(
+                fan_id=job.fan_id,
+                documento_nome=job.documento_nome,
+                validado=is_valid,
+                texto_extraido=extracted_text
+            )
+            db.add(documento)
+            db.flush()
+
+            job.documento_id = documento.id
+            job.status = "concluido"
+            job.erro = None
+            job.atualizado_em = datetime.utcnow()
+            db.commit()
+            remover_arquivo(job.caminho_arquivo)
+            logger.info(f"Job {job_id} concluído (documento {documento.id})")
+
+        except Exception as e:
+            db.rollback()
+            job.erro = str(e)
+            job.atualizado_em = datetime.utcnow()
+            if job.tentativas < job.max_tentativas:
+                # Nova tentativa com espera exponencial: 2s, 4s, 8s...
+                job.status = "pendente"
+                job.disponivel_em = datetime.utcnow() + timedelta(seconds=2 ** job.tentativas)
+                logger.warning(f"Job {job_id} falhou (tentativa {job.tentativas}), será repetido: {str(e)}")
+            else:
+                job.status = "erro"
+                remover_arquivo(job.caminho_arquivo)
+                logger.error(f"Job {job_id} falhou definitivamente: {str(e)}")
+            db.commit()
+    finally:
+        db.close()
+
+class FilaDocumentos:
+    def __init__(self, workers: int = FILA_DOCUMENTOS_WORKERS, intervalo: float = FILA_DOCUMENTOS_INTERVALO):
+        self.workers = workers
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._novo_job = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def iniciar(self):
+        os.makedirs(DOCUMENTOS_PENDENTES_FOLDER, exist_ok=True)
+        self._recuperar_jobs_interrompidos()
+        self._parar.clear()
+        for numero in range(self.workers):
+            thread = threading.Thread(target=self._executar, name=f"fila-documentos-{numero}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Fila de documentos iniciada com {self.workers} workers")
+
+    def parar(self):
+        self._parar.set()
+        self._novo_job.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def notificar(self):
+        # Acorda um worker ocioso sem esperar o próximo ciclo de polling
+        self._novo_job.set()
+
+    def _recuperar_jobs_interrompidos(self):
+        # Jobs que estavam em processamento quando o servidor parou voltam para a fila. A execução
+        # interrompida já contou como tentativa (reservar_proximo_job); quem esgotou as tentativas
+        # falha, para um documento que derruba o worker não ser repetido a cada reinício
+        db = SessionLocal()
+        try:
+            agora = datetime.utcnow()
+            esgotados = db.query(JobDocumento).filter(
+                JobDocumento.status == "processando",
+                JobDocumento.tentativas >= JobDocumento.max_tentativas
+            ).all()
+            for job in esgotados:
+                job.status = "erro"
+                job.erro = "Processamento interrompido (reinício do servidor) e tentativas esgotadas"
+                job.atualizado_em = agora
+            recuperados = db.query(JobDocumento).filter(
+                JobDocumento.status == "processando"
+            ).update({"status": "pendente", "atualizado_em": agora}, synchronize_session=False)
+            db.commit()
+            for job in esgotados:
+                remover_arquivo(job.caminho_arquivo)
+            if esgotados:
+                logger.warning(f"{len(esgotados)} jobs interrompidos esgotaram as tentativas e falharam")
+            if recuperados:
+                logger.info(f"{recuperados} jobs interrompidos voltaram para a fila")
+        finally:
+            db.close()
+
+    def _executar(self):
+        while not self._parar.is_set():
+            db = SessionLocal()
+            try:
+                job_id = reservar_proximo_job(db)
+            except Exception as e:
+                logger.error(f"Erro ao buscar job na fila: {str(e)}")
+                job_id = None
+            finally:
+                db.close()
+
+            if job_id is None:
+                self._novo_job.wait(self.intervalo)
+                self._novo_job.clear()
+                continue
+
+            try:
+                processar_job(job_id)
+            except Exception as e:
+                logger.error(f"Erro inesperado no job {job_id}: {str(e)}")
+
+fila_documentos = FilaDocumentos()
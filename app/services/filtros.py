@@ -0,0 +1,72 @@
+import re
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import column, literal_column, select, table
+from app.models import Fan
+from app.services.engajamento import NIVEIS_ENGAJAMENTO
+from app.services.tags import filtro_por_tag
+
+# Filtros de fãs compartilhados pelas rotas do dashboard
+
+def normalizar_nivel_engajamento(engajamento: Optional[str]) -> Optional[str]:
+    if not engajamento:
+        return None
+
+    nivel = NIVEIS_ENGAJAMENTO.get(engajamento.strip().lower())
+    if not nivel:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Nível de engajamento inválido: {engajamento}. Valores permitidos: Alto, Médio, Baixo"
+        )
+    return nivel
+
+def aplicar_filtros_fans(
+    query,
+    interesse: Optional[str] = None,
+    evento: Optional[str] = None,
+    compra: Optional[str] = None,
+    engajamento: Optional[str] = None
+):
+    if interesse:
+        query = query.filter(filtro_por_tag("interesse", interesse))
+
+    if evento:
+        query = query.filter(filtro_por_tag("evento", evento))
+
+    if compra:
+        query = query.filter(filtro_por_tag("compra", compra))
+
+    # Igualdade sobre a coluna materializada (índice ix_fans_engajamento)
+    nivel = normalizar_nivel_engajamento(engajamento)
+    if nivel:
+        query = query.filter(Fan.engajamento == nivel)
+
+    return query
+
+# Índice FTS5 sobre fans.nome, criado e mantido pela migração 0004 (triggers)
+fans_fts = table("fans_fts", column("rowid"), column("rank"))
+
+def consulta_fts(nome: str) -> Optional[str]:
+    # Cada palavra vira um prefixo entre aspas ("jo"* "sil"*), exigindo todas.
+    # Acentos e maiúsculas são ignorados pelo tokenizer (remove_diacritics)
+    termos = re.findall(r"\w+", nome or "")
+    if not termos:
+        return None
+    return " ".join(f'"{termo}"*' for termo in termos)
+
+def busca_por_nome(nome: str):
+    # Subconsulta (fan_id, relevancia) com os fãs cujo nome casa com a busca;
+    # relevancia é o bm25 do FTS5 (menor = mais relevante)
+    consulta = consulta_fts(nome)
+    if not consulta:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe ao menos uma letra ou número para buscar por nome"
+        )
+
+    return select(
+        fans_fts.c.rowid.label("fan_id"),
+        fans_fts.c.rank.label("relevancia")
+    ).where(
+        literal_column("fans_fts").op("MATCH")(consulta)
+    ).subquery()
@@ -0,0 +1,109 @@
+import csv
+import json
+import logging
+from typing import AsyncIterator, Dict, List, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.models import Fan, FanCadastro
+from app.services.engajamento import recalcular_engajamento
+from app.services.estatisticas import registrar_fans
+from app.services.tags import CATEGORIAS_TAGS, SEPARADOR_LISTA_CSV, atribuir_tags_em_lote
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_IMPORTACAO = 500
+MAX_ERROS_REPORTADOS = 1000
+
+async def linhas_do_corpo(corpo: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # Quebra o corpo da requisição em linhas à medida que os pedaços chegam
+    pendente = b""
+    primeira = True
+    async for pedaco in corpo:
+        pendente += pedaco
+        if primeira and len(pendente) >= 3:
+            pendente = pendente.removeprefix(b"\xef\xbb\xbf")
+            primeira = False
+        *linhas, pendente = pendente.split(b"\n")
+        for linha in linhas:
+            yield linha.rstrip(b"\r")
+    if primeira:
+        pendente = pendente.removeprefix(b"\xef\xbb\xbf")
+    if pendente:
+        yield pendente.rstrip(b"\r")
+
+def registro_ndjson(linha: str) -> dict:
+    registro = json.loads(linha)
+    if not isinstance(registro, dict):
+        raise ValueError("cada linha deve ser um objeto JSON")
+    return registro
+
+def registro_csv(linha: str, cabecalho: List[str]) -> dict:
+    valores = next(csv.reader([linha]))
+    if len(valores) != len(cabecalho):
+        raise ValueError(f"esperadas {len(cabecalho)} colunas, encontradas {len(valores)}")
+
+    registro = dict(zip(cabecalho, valores))
+    for campo in CATEGORIAS_TAGS.values():
+        if campo in registro:
+            registro[campo] = [valor for valor in registro[campo].split(SEPARADOR_LISTA_CSV) if valor.strip()]
+    if not registro.get("email"):
+        registro.pop("email", None)
+    return registro
+
+def validar_registro(registro: dict) -> FanCadastro:
+    return FanCadastro(**registro)
+
+def descrever_erro(erro: Exception) -> List[str]:
+    if isinstance(erro, ValidationError):
+        return [
+            f"{'.'.join(str(parte) for parte in detalhe['loc'])}: {detalhe['msg']}"
+            for detalhe in erro.errors()
+        ]
+    return [str(erro)]
+
+def inserir_lote(db: Session, fans: List[FanCadastro]) -> List[int]:
+    # INSERT em lote (executemany com RETURNING) + tags, contadores e engajamento
+    ids = db.execute(
+        insert(Fan).returning(Fan.id, sort_by_parameter_order=True),
+        [
+            {
+                "nome": fan.nome,
+                "endereco": fan.endereco,
+                "cpf": fan.cpf.replace(".", "").replace("-", "")
+            }
+            for fan in fans
+        ]
+    ).scalars().all()
+
+    tags_por_fan = {
+        fan_id: {categoria: getattr(fan, campo) for categoria, campo in CATEGORIAS_TAGS.items()}
+        for fan_id, fan in zip(ids, fans)
+    }
+    atribuir_tags_em_lote(db, tags_por_fan)
+    registrar_fans(db, list(tags_por_fan.values()))
+    recalcular_engajamento(db, ids)
+    return ids
+
+def gravar_lote(db: Session, lote: List[Tuple[int, FanCadastro]]) -> Tuple[int, List[Dict]]:
+    # Grava o lote em uma transação; se falhar, isola as linhas problemáticas
+    try:
+        inserir_lote(db, [fan for _, fan in lote])
+        db.commit()
+        return len(lote), []
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.warning(f"Falha ao gravar lote de {len(lote)} fãs, gravando linha a linha: {str(e)}")
+
+    importados = 0
+    erros = []
+    for numero, fan in lote:
+        try:
+            inserir_lote(db, [fan])
+            db.commit()
+            importados += 1
+        except SQLAlchemyError as e:
+            db.rollback()
+            erros.append({"linha": numero, "erros": [f"Erro ao gravar: {str(e)}"]})
+    return importados, erros
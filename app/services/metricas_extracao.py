@@ -0,0 +1,54 @@
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+# Latências guardadas por (rede, camada) para os percentis; as mais antigas saem primeiro
+TAMANHO_JANELA_LATENCIAS = 500
+
+def percentil(valores, p: float) -> Optional[float]:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+class MetricasExtracao:
+    # Contadores por rede e camada de extração (http, selenium, cache...) para ajustar as políticas
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados: Dict[str, Dict[str, Dict]] = {}
+
+    def registrar(self, rede: str, camada: str, latencia: float, suficiente: bool, erro: bool = False):
+        with self._lock:
+            dados = self._dados.setdefault(rede, {}).setdefault(camada, {
+                "tentativas": 0,
+                "suficientes": 0,
+                "erros": 0,
+                "latencias": deque(maxlen=TAMANHO_JANELA_LATENCIAS),
+            })
+            dados["tentativas"] += 1
+            dados["suficientes"] += int(suficiente)
+            dados["erros"] += int(erro)
+            dados["latencias"].append(latencia)
+
+    def resumo(self) -> Dict:
+        with self._lock:
+            return {
+                rede: {
+                    camada: {
+                        "tentativas": dados["tentativas"],
+                        "suficientes": dados["suficientes"],
+                        "erros": dados["erros"],
+                        "taxa_acerto": round(dados["suficientes"] / dados["tentativas"], 4),
+                        "latencia_p50_ms": self._em_ms(percentil(dados["latencias"], 0.5)),
+                        "latencia_p95_ms": self._em_ms(percentil(dados["latencias"], 0.95)),
+                    }
+                    for camada, dados in camadas.items()
+                }
+                for rede, camadas in self._dados.items()
+            }
+
+    @staticmethod
+    def _em_ms(segundos: Optional[float]) -> Optional[float]:
+        return round(segundos * 1000, 1) if segundos is not None else None
+
+metricas_extracao = MetricasExtracao()
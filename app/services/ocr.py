@@ -0,0 +1,177 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Union
+from PIL import Image
+import pdf2image
+from app.services.ocr_backends import OCR_LANG, nome_backend_configurado, obter_backend
+from app.services.preprocessamento import assinatura_preprocessamento, preprocessar
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de processos de OCR; por padrão, um por CPU
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "0")) or os.cpu_count() or 1
+
+# PDFs: resolução da rasterização e limite de páginas lidas
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "200"))
+OCR_PDF_MAX_PAGINAS = int(os.getenv("OCR_PDF_MAX_PAGINAS", "10"))
+
+# Pasta dos binários do poppler; vazio usa os que estiverem no PATH
+POPPLER_PATH = os.getenv("POPPLER_PATH") or None
+
+# Modo de segmentação: imagens são lidas como um bloco de texto; páginas de PDF, automaticamente
+OCR_PSM_IMAGEM = 6
+OCR_PSM_PDF = 3
+OCR_VARIAVEIS_IMAGEM = {"preserve_interword_spaces": "1"}
+
+# O arquivo pode chegar em memória (bytes do upload) ou como caminho em disco
+OrigemArquivo = Union[bytes, str]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def ocr_imagem(img, psm=OCR_PSM_PDF, variaveis=None):
+    return obter_backend().reconhecer(img, psm, variaveis or {})
+
+def abrir_imagem(origem: OrigemArquivo):
+    if isinstance(origem, bytes):
+        return Image.open(io.BytesIO(origem))
+    return Image.open(origem)
+
+def contar_paginas_pdf(origem: OrigemArquivo) -> int:
+    if isinstance(origem, bytes):
+        info = pdf2image.pdfinfo_from_bytes(origem, poppler_path=POPPLER_PATH)
+    else:
+        info = pdf2image.pdfinfo_from_path(origem, poppler_path=POPPLER_PATH)
+    total = int(info.get("Pages", 0))
+    if total > OCR_PDF_MAX_PAGINAS:
+        logger.warning(f"PDF com {total} páginas; apenas as {OCR_PDF_MAX_PAGINAS} primeiras serão lidas")
+    return min(total, OCR_PDF_MAX_PAGINAS)
+
+def ocr_pagina_pdf(origem: OrigemArquivo, pagina):
+    # Rasteriza somente a página pedida, então a memória não cresce com o tamanho do PDF
+    converter = pdf2image.convert_from_bytes if isinstance(origem, bytes) else pdf2image.convert_from_path
+    imagens = converter(
+        origem,
+        dpi=OCR_PDF_DPI,
+        first_page=pagina,
+        last_page=pagina,
+        poppler_path=POPPLER_PATH
+    )
+    return "".join(ocr_imagem(img) for img in imagens)
+
+def extract_text_from_file(origem: OrigemArquivo, content_type):
+    try:
+        if content_type.startswith("image/"):
+            img = preprocessar(abrir_imagem(origem))
+            return ocr_imagem(img, psm=OCR_PSM_IMAGEM, variaveis=OCR_VARIAVEIS_IMAGEM)
+
+        elif content_type == "application/pdf":
+            paginas = range(1, contar_paginas_pdf(origem) + 1)
+            return "\n".join(ocr_pagina_pdf(origem, pagina) for pagina in paginas)
+        else:
+            return None
+    except Exception as e:
+        logger.error(f"Erro na extração de texto: {str(e)}")
+        return None
+
+def assinatura_ocr(content_type) -> str:
+    # Tudo que muda o texto extraído; entra na chave do cache de OCR
+    if content_type == "application/pdf":
+        return f"pdf|{nome_backend_configurado()}|{OCR_LANG}|psm={OCR_PSM_PDF}|dpi={OCR_PDF_DPI}|paginas={OCR_PDF_MAX_PAGINAS}"
+    return f"imagem|{nome_backend_configurado()}|{OCR_LANG}|psm={OCR_PSM_IMAGEM}|{sorted(OCR_VARIAVEIS_IMAGEM.items())}|{assinatura_preprocessamento()}"
+
+@contextmanager
+def origem_para_tarefas(origem: OrigemArquivo, content_type):
+    # Cada página de PDF é uma tarefa em outro processo: com bytes, o PDF inteiro seria enviado
+    # (e regravado em disco pelo pdf2image) uma vez por página. Grava um único arquivo e passa o caminho
+    if content_type != "application/pdf" or not isinstance(origem, bytes):
+        yield origem
+        return
+    descritor, caminho = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            arquivo.write(origem)
+        yield caminho
+    finally:
+        try:
+            os.remove(caminho)
+        except OSError as e:
+            logger.warning(f"Erro ao remover o arquivo {caminho}: {str(e)}")
+
+def tarefas_ocr(origem: OrigemArquivo, content_type):
+    # PDFs viram uma tarefa por página, distribuídas entre os processos do pool
+    if content_type == "application/pdf":
+        paginas = range(1, contar_paginas_pdf(origem) + 1)
+        return [(ocr_pagina_pdf, (origem, pagina)) for pagina in paginas]
+    return [(extract_text_from_file, (origem, content_type))]
+
+def juntar_textos(textos):
+    if all(texto is None for texto in textos):
+        return None
+    return "\n".join(texto or "" for texto in textos)
+
+def iniciar_worker_ocr():
+    # Carrega o modelo do Tesseract assim que o processo sobe, antes do primeiro documento
+    obter_backend()
+
+def obter_executor_ocr() -> ProcessPoolExecutor:
+    # Pool criado sob demanda; "spawn" evita herdar threads e conexões do servidor
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            logger.info(f"Iniciando pool de OCR com {OCR_MAX_WORKERS} processos")
+            _executor = ProcessPoolExecutor(
+                max_workers=OCR_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=iniciar_worker_ocr
+            )
+        return _executor
+
+def encerrar_executor_ocr():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+def extrair_texto(origem: OrigemArquivo, content_type, levantar: bool = False):
+    # Versão bloqueante, para threads fora do event loop (ex.: fila de documentos).
+    # Com levantar=True a falha do OCR vira exceção, para quem chama poder repetir
+    try:
+        executor = obter_executor_ocr()
+        with origem_para_tarefas(origem, content_type) as origem:
+            futuros = [executor.submit(funcao, *args) for funcao, args in tarefas_ocr(origem, content_type)]
+            texto = juntar_textos([futuro.result() for futuro in futuros])
+    except Exception as e:
+        if levantar:
+            raise
+        logger.error(f"Erro na extração de texto: {str(e)}")
+        return None
+    if texto is None and levantar:
+        raise RuntimeError("Não foi possível extrair texto do arquivo")
+    return texto
+
+async def extrair_texto_async(origem: OrigemArquivo, content_type):
+    # Executa o OCR fora do event loop; as páginas de um PDF rodam em paralelo
+    # e o texto é juntado uma única vez, na ordem das páginas
+    try:
+        loop = asyncio.get_running_loop()
+        executor = obter_executor_ocr()
+        with origem_para_tarefas(origem, content_type) as origem:
+            # Contar as páginas chama o pdfinfo; fica fora do event loop também
+            tarefas = await loop.run_in_executor(None, tarefas_ocr, origem, content_type)
+            textos = await asyncio.gather(*[
+                loop.run_in_executor(executor, funcao, *args)
+                for funcao, args in tarefas
+            ])
+        return juntar_textos(textos)
+    except Exception as e:
+        logger.error(f"Erro na extração de texto: {str(e)}")
+        return None
@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+from typing import Dict
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+# "auto" usa o tesserocr quando instalado e cai para o pytesseract caso contrário
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto").lower()
+OCR_LANG = os.getenv("OCR_LANG", "por")
+
+# Executável do tesseract usado pelo pytesseract; vazio usa o que estiver no PATH
+TESSERACT_CMD = os.getenv("TESSERACT_CMD") or None
+
+# Pasta com os arquivos .traineddata; vazio usa a padrão da instalação
+TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX") or None
+
+OCR_OEM = 3
+
+class BackendPytesseract:
+    # Um processo do tesseract por imagem; funciona em qualquer instalação
+    nome = "pytesseract"
+
+    def __init__(self):
+        if TESSERACT_CMD:
+            pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+    def reconhecer(self, img, psm: int, variaveis: Dict[str, str]) -> str:
+        config = f"--oem {OCR_OEM} --psm {psm}"
+        for nome, valor in variaveis.items():
+            config += f" -c {nome}={valor}"
+        return pytesseract.image_to_string(img, lang=OCR_LANG, config=config)
+
+class BackendTesserocr:
+    # API do Tesseract carregada uma única vez por processo e reaproveitada
+    nome = "tesserocr"
+
+    def __init__(self):
+        argumentos = {"lang": OCR_LANG, "oem": OCR_OEM}
+        if TESSDATA_PREFIX:
+            argumentos["path"] = TESSDATA_PREFIX
+        self._api = tesserocr.PyTessBaseAPI(**argumentos)
+        self._padroes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _aplicar_variaveis(self, variaveis: Dict[str, str]):
+        # Variáveis persistem no handle; as que não vieram nesta chamada voltam ao padrão
+        for nome in set(self._padroes) | set(variaveis):
+            if nome not in self._padroes:
+                self._padroes[nome] = self._api.GetVariableAsString(nome)
+            self._api.SetVariable(nome, variaveis.get(nome, self._padroes[nome]))
+
+    def reconhecer(self, img, psm: int, variaveis: Dict[str, str]) -> str:
+        with self._lock:
+            self._api.SetPageSegMode(psm)
+            self._aplicar_variaveis(variaveis)
+            self._api.SetImage(img)
+            return self._api.GetUTF8Text()
+
+def nome_backend_configurado() -> str:
+    # Entra na assinatura do cache de OCR: trocar de motor não reaproveita textos do outro
+    if OCR_BACKEND not in ("auto", "tesserocr") or tesserocr is None:
+        return BackendPytesseract.nome
+    return BackendTesserocr.nome
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def criar_backend():
+    if OCR_BACKEND not in ("auto", "tesserocr", "pytesseract"):
+        logger.warning(f"OCR_BACKEND inválido: {OCR_BACKEND}; usando pytesseract")
+        return BackendPytesseract()
+
+    if nome_backend_configurado() == BackendTesserocr.nome:
+        try:
+            return BackendTesserocr()
+        except Exception as e:
+            logger.warning(f"Não foi possível iniciar o tesserocr, usando pytesseract: {str(e)}")
+    elif OCR_BACKEND == "tesserocr":
+        logger.warning("tesserocr não está instalado; usando pytesseract")
+    return BackendPytesseract()
+
+def obter_backend():
+    # Um backend por processo, criado no primeiro uso (ou no início do worker)
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = criar_backend()
+            logger.info(f"Backend de OCR: {_backend.nome} ({OCR_LANG})")
+        return _backend
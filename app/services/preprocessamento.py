@@ -0,0 +1,189 @@
+import logging
+import os
+from typing import Callable, Dict, List
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# "rapido" troca um pouco de precisão por imagens menores; "preciso" mantém mais detalhes e corrige a inclinação
+PRESETS_OCR: Dict[str, Dict] = {
+    "rapido": {
+        "max_dimensao": 1600,
+        "dpi_alvo": 200,
+        "contraste": 2.0,
+        "recortar": True,
+        "endireitar": False,
+        "binarizar": True,
+    },
+    "preciso": {
+        "max_dimensao": 3200,
+        "dpi_alvo": 300,
+        "contraste": 2.0,
+        "recortar": True,
+        "endireitar": True,
+        "binarizar": False,
+    },
+}
+
+OCR_PRESET = os.getenv("OCR_PRESET", "preciso").lower()
+if OCR_PRESET not in PRESETS_OCR:
+    logger.warning(f"OCR_PRESET inválido: {OCR_PRESET}; usando preciso")
+    OCR_PRESET = "preciso"
+
+# Inclinação máxima procurada pelo endireitamento, em graus
+ANGULO_MAX_INCLINACAO = 5.0
+PASSO_INCLINACAO = 0.5
+
+# Imagens reduzidas usadas só para análise (inclinação e região do texto)
+TAMANHO_AMOSTRA = 800
+
+def opcoes_preset(nome: str = None) -> Dict:
+    return PRESETS_OCR[nome or OCR_PRESET]
+
+def limiar_otsu(img: Image.Image) -> int:
+    histograma = img.histogram()[:256]
+    total = sum(histograma)
+    soma_total = sum(valor * quantidade for valor, quantidade in enumerate(histograma))
+
+    soma_fundo = peso_fundo = 0
+    melhor_variancia, limiar = 0.0, 127
+    for valor, quantidade in enumerate(histograma):
+        peso_fundo += quantidade
+        peso_frente = total - peso_fundo
+        if peso_fundo == 0:
+            continue
+        if peso_frente == 0:
+            break
+        soma_fundo += valor * quantidade
+        media_fundo = soma_fundo / peso_fundo
+        media_frente = (soma_total - soma_fundo) / peso_frente
+        variancia = peso_fundo * peso_frente * (media_fundo - media_frente) ** 2
+        if variancia > melhor_variancia:
+            melhor_variancia, limiar = variancia, valor
+    return limiar
+
+def amostra(img: Image.Image) -> Image.Image:
+    reduzida = img.copy()
+    reduzida.thumbnail((TAMANHO_AMOSTRA, TAMANHO_AMOSTRA))
+    return reduzida
+
+def redimensionar(img: Image.Image, opcoes: Dict) -> Image.Image:
+    # O tempo do Tesseract cresce com a quantidade de pixels; fotos de celular chegam a 12 MP
+    largura, altura = img.size
+    escala = 1.0
+    dpi = img.info.get("dpi")
+    if opcoes.get("dpi_alvo") and dpi and dpi[0] > opcoes["dpi_alvo"]:
+        escala = opcoes["dpi_alvo"] / dpi[0]
+    if opcoes.get("max_dimensao") and max(largura, altura) * escala > opcoes["max_dimensao"]:
+        escala = opcoes["max_dimensao"] / max(largura, altura)
+    if escala >= 1.0:
+        return img
+
+    tamanho = (max(1, round(largura * escala)), max(1, round(altura * escala)))
+    return img.resize(tamanho, Image.LANCZOS)
+
+def tons_de_cinza(img: Image.Image, opcoes: Dict) -> Image.Image:
+    # Em JPEGs, o próprio decodificador já entrega a imagem em tons de cinza, no tamanho original
+    img.draft("L", img.size)
+    return img.convert("L")
+
+def caixa_com_margem(caixa, reduzida: Image.Image, img: Image.Image):
+    escala = img.width / reduzida.width
+    margem = 0.02 * max(reduzida.size)
+    return (
+        max(0, int((caixa[0] - margem) * escala)),
+        max(0, int((caixa[1] - margem) * escala)),
+        min(img.width, int((caixa[2] + margem) * escala)),
+        min(img.height, int((caixa[3] + margem) * escala)),
+    )
+
+def recortar_na_caixa(img: Image.Image, mascara: Image.Image, reduzida: Image.Image) -> Image.Image:
+    caixa = mascara.getbbox()
+    if caixa is None:
+        return img
+    esquerda, topo, direita, base = caixa_com_margem(caixa, reduzida, img)
+    if (direita - esquerda) * (base - topo) < 0.05 * img.width * img.height:
+        return img
+    return img.crop((esquerda, topo, direita, base))
+
+def recortar(img: Image.Image, opcoes: Dict) -> Image.Image:
+    # Primeiro o documento (área clara sobre a mesa), depois a região com texto dentro dele
+    if not opcoes.get("recortar"):
+        return img
+
+    reduzida = amostra(img)
+    limiar = limiar_otsu(reduzida)
+    papel = reduzida.point(lambda p: 255 if p > limiar else 0)
+    papel = papel.filter(ImageFilter.MinFilter(9)).filter(ImageFilter.MaxFilter(9))
+    img = recortar_na_caixa(img, papel, reduzida)
+
+    # Texto: pixels escuros sem pontos isolados, unidos em blocos
+    reduzida = amostra(img)
+    limiar = limiar_otsu(reduzida)
+    tinta = reduzida.point(lambda p: 255 if p < limiar else 0)
+    tinta = tinta.filter(ImageFilter.MinFilter(3)).filter(ImageFilter.MaxFilter(9))
+    return recortar_na_caixa(img, tinta, reduzida)
+
+def pontuacao_inclinacao(reduzida: Image.Image, angulo: float, fundo: int) -> float:
+    # Os cantos expostos pela rotação recebem a cor do fundo, para não criarem variação falsa
+    girada = reduzida.rotate(angulo, resample=Image.BILINEAR, fillcolor=fundo)
+    perfil = list(girada.resize((1, girada.height), Image.BOX).getdata())
+    return sum((b - a) ** 2 for a, b in zip(perfil, perfil[1:]))
+
+def angulo_inclinacao(img: Image.Image) -> float:
+    # Perfil de projeção: com as linhas de texto na horizontal, a soma por linha varia mais.
+    # 0° é a referência; outro ângulo só vence com pontuação estritamente maior (páginas em branco ficam como estão)
+    reduzida = ImageOps.invert(amostra(img))
+    histograma = reduzida.histogram()[:256]
+    fundo = histograma.index(max(histograma))
+    melhor_angulo, melhor_pontuacao = 0.0, pontuacao_inclinacao(reduzida, 0.0, fundo)
+    passos = int(ANGULO_MAX_INCLINACAO / PASSO_INCLINACAO)
+    for passo in range(-passos, passos + 1):
+        if passo == 0:
+            continue
+        angulo = passo * PASSO_INCLINACAO
+        pontuacao = pontuacao_inclinacao(reduzida, angulo, fundo)
+        if pontuacao > melhor_pontuacao:
+            melhor_angulo, melhor_pontuacao = angulo, pontuacao
+    return melhor_angulo
+
+def endireitar(img: Image.Image, opcoes: Dict) -> Image.Image:
+    if not opcoes.get("endireitar"):
+        return img
+    angulo = angulo_inclinacao(img)
+    if abs(angulo) < PASSO_INCLINACAO:
+        return img
+    return img.rotate(angulo, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+def contraste(img: Image.Image, opcoes: Dict) -> Image.Image:
+    if not opcoes.get("contraste"):
+        return img
+    return ImageEnhance.Contrast(img).enhance(opcoes["contraste"])
+
+def binarizar(img: Image.Image, opcoes: Dict) -> Image.Image:
+    if not opcoes.get("binarizar"):
+        return img
+    limiar = limiar_otsu(img)
+    return img.point(lambda p: 255 if p > limiar else 0)
+
+# Etapas aplicadas em ordem; cada uma recebe a imagem e as opções do preset
+# O recorte vem antes da redução: numa foto em que o documento ocupa parte do quadro,
+# o limite de tamanho vale para o documento, sem perder resolução no texto
+ETAPAS_PREPROCESSAMENTO: List[Callable[[Image.Image, Dict], Image.Image]] = [
+    tons_de_cinza,
+    recortar,
+    redimensionar,
+    endireitar,
+    contraste,
+    binarizar,
+]
+
+def preprocessar(img: Image.Image, preset: str = None) -> Image.Image:
+    opcoes = opcoes_preset(preset)
+    for etapa in ETAPAS_PREPROCESSAMENTO:
+        img = etapa(img, opcoes)
+    return img
+
+def assinatura_preprocessamento(preset: str = None) -> str:
+    nome = preset or OCR_PRESET
+    return f"{nome}|{sorted(opcoes_preset(nome).items())}|{[etapa.__name__ for etapa in ETAPAS_PREPROCESSAMENTO]}"
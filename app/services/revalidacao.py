@@ -0,0 +1,100 @@
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Set, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models import Documento, Fan
+from app.services.documento_validator import validate_document_text
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_REVALIDACAO = 2000
+INTERVALO_LOG_LOTES = 50
+
+# (id do documento, texto usado na validação, nome do fã, validado atual)
+LinhaDocumento = Tuple[int, str, str, bool]
+
+def textos_dos_grupos(db: Session, lote_ids: Set[str]) -> Dict[str, str]:
+    # Texto combinado de cada envio em lote, como em /upload/{fan_id}/batch; os membros
+    # do grupo podem estar fora da página atual
+    if not lote_ids:
+        return {}
+    textos: Dict[str, List[str]] = {}
+    for lote_id, texto in db.query(Documento.lote_id, Documento.texto_extraido).filter(
+        Documento.lote_id.in_(lote_ids)
+    ).order_by(Documento.id):
+        if texto:
+            textos.setdefault(lote_id, []).append(texto)
+    return {lote_id: "\n".join(partes) for lote_id, partes in textos.items()}
+
+def lotes_documentos(db: Session, tamanho_lote: int) -> Iterator[List[LinhaDocumento]]:
+    # Paginação por chave (id > último visto): cada lote é uma consulta curta pelo índice
+    ultimo_id = 0
+    while True:
+        lote = db.query(
+            Documento.id, Documento.texto_extraido, Fan.nome, Documento.validado, Documento.lote_id
+        ).join(
+            Fan, Fan.id == Documento.fan_id
+        ).filter(
+            Documento.id > ultimo_id
+        ).order_by(Documento.id).limit(tamanho_lote).all()
+        if not lote:
+            return
+        ultimo_id = lote[-1][0]
+        grupos = textos_dos_grupos(db, {linha.lote_id for linha in lote if linha.lote_id})
+        yield [
+            (linha.id, grupos.get(linha.lote_id, "") if linha.lote_id else linha.texto_extraido, linha.nome, linha.validado)
+            for linha in lote
+        ]
+
+def revalidar_lote(lote: List[LinhaDocumento]) -> Tuple[int, List[Tuple[int, bool]]]:
+    # Roda nos processos do pool; devolve só os documentos cujo resultado mudou
+    alterados = []
+    for documento_id, texto, nome, validado in lote:
+        novo = validate_document_text(texto, nome)
+        if novo != bool(validado):
+            alterados.append((documento_id, novo))
+    return len(lote), alterados
+
+def revalidar_documentos(
+    db: Session,
+    processos: int = None,
+    tamanho_lote: int = TAMANHO_LOTE_REVALIDACAO,
+    simular: bool = False
+) -> Dict:
+    processos = processos or os.cpu_count() or 1
+    resumo = {"lotes": 0, "documentos": 0, "inalterados": 0, "passaram_a_validos": 0, "passaram_a_invalidos": 0}
+    inicio = time.perf_counter()
+
+    def gravar(resultado):
+        total, alterados = resultado
+        resumo["documentos"] += total
+        resumo["inalterados"] += total - len(alterados)
+        resumo["passaram_a_validos"] += sum(1 for _, novo in alterados if novo)
+        resumo["passaram_a_invalidos"] += sum(1 for _, novo in alterados if not novo)
+        if alterados and not simular:
+            db.execute(update(Documento), [{"id": documento_id, "validado": novo} for documento_id, novo in alterados])
+            db.commit()
+        resumo["lotes"] += 1
+        if resumo["lotes"] % INTERVALO_LOG_LOTES == 0:
+            decorrido = time.perf_counter() - inicio
+            logger.info(f"{resumo['documentos']} documentos revalidados ({resumo['documentos'] / decorrido:.0f}/s)")
+
+    # No máximo dois lotes por processo em andamento: a memória não cresce com a tabela
+    with multiprocessing.get_context("spawn").Pool(processos) as pool:
+        pendentes = deque()
+        for lote in lotes_documentos(db, tamanho_lote):
+            pendentes.append(pool.apply_async(revalidar_lote, (lote,)))
+            if len(pendentes) >= processos * 2:
+                gravar(pendentes.popleft().get())
+        while pendentes:
+            gravar(pendentes.popleft().get())
+
+    duracao = time.perf_counter() - inicio
+    resumo["duracao_segundos"] = round(duracao, 3)
+    resumo["documentos_por_segundo"] = round(resumo["documentos"] / duracao, 1) if duracao else None
+    resumo["simulacao"] = simular
+    return resumo
@@ -0,0 +1,103 @@
+from typing import Dict, Iterable, List
+from sqlalchemy import literal_column, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models import Fan, Tag, fan_tags
+
+# Categorias de tags e o campo correspondente em FanCadastro
+CATEGORIAS_TAGS = {
+    "interesse": "interesses",
+    "evento": "eventos",
+    "compra": "compras",
+    "atividade": "atividades",
+}
+
+# Separador das listas de tags em arquivos CSV (exportação e importação)
+SEPARADOR_LISTA_CSV = "|"
+
+def normalizar_tags(nomes: Iterable[str]) -> List[str]:
+    # Remove espaços, valores vazios e duplicados mantendo a ordem original
+    vistos = []
+    for nome in nomes or []:
+        nome = (nome or "").strip()
+        if nome and nome not in vistos:
+            vistos.append(nome)
+    return vistos
+
+def obter_ou_criar_tags(db: Session, categoria: str, nomes: List[str]) -> Dict[str, int]:
+    if not nomes:
+        return {}
+
+    db.execute(
+        sqlite_insert(Tag).on_conflict_do_nothing(index_elements=["categoria", "nome"]),
+        [{"categoria": categoria, "nome": nome} for nome in nomes]
+    )
+    linhas = db.query(Tag.nome, Tag.id).filter(
+        Tag.categoria == categoria,
+        Tag.nome.in_(nomes)
+    ).all()
+    return {nome: tag_id for nome, tag_id in linhas}
+
+def atribuir_tags(db: Session, fan_id: int, tags_por_categoria: Dict[str, Iterable[str]]):
+    atribuir_tags_em_lote(db, {fan_id: tags_por_categoria})
+
+def atribuir_tags_em_lote(db: Session, tags_por_fan: Dict[int, Dict[str, Iterable[str]]]):
+    # Uma ida ao banco por categoria para resolver as tags e um executemany
+    # para as associações, qualquer que seja o tamanho do lote
+    normalizadas = {
+        fan_id: {categoria: normalizar_tags(nomes) for categoria, nomes in tags.items()}
+        for fan_id, tags in tags_por_fan.items()
+    }
+    categorias = {categoria for tags in normalizadas.values() for categoria in tags}
+
+    associacoes = []
+    for categoria in categorias:
+        nomes = normalizar_tags(
+            nome for tags in normalizadas.values() for nome in tags.get(categoria, [])
+        )
+        ids = obter_ou_criar_tags(db, categoria, nomes)
+        for fan_id, tags in normalizadas.items():
+            associacoes.extend(
+                {"fan_id": fan_id, "tag_id": ids[nome]} for nome in tags.get(categoria, [])
+            )
+
+    if associacoes:
+        db.execute(
+            sqlite_insert(fan_tags).on_conflict_do_nothing(),
+            associacoes
+        )
+
+def carregar_tags(db: Session, fan_ids: List[int]) -> Dict[int, Dict[str, List[str]]]:
+    # Tags de vários fãs em uma única consulta, agrupadas por fã e categoria
+    resultado = {
+        fan_id: {categoria: [] for categoria in CATEGORIAS_TAGS}
+        for fan_id in fan_ids
+    }
+    if not fan_ids:
+        return resultado
+
+    linhas = db.query(fan_tags.c.fan_id, Tag.categoria, Tag.nome).join(
+        Tag, Tag.id == fan_tags.c.tag_id
+    ).filter(
+        fan_tags.c.fan_id.in_(fan_ids)
+    ).order_by(
+        # rowid de fan_tags segue a ordem de inserção, ou seja, a ordem em que o fã informou as tags
+        fan_tags.c.fan_id, literal_column("fan_tags.rowid")
+    ).all()
+
+    for fan_id, categoria, nome in linhas:
+        resultado[fan_id].setdefault(categoria, []).append(nome)
+    return resultado
+
+def tags_do_fan(db: Session, fan_id: int, categoria: str) -> List[str]:
+    return carregar_tags(db, [fan_id])[fan_id].get(categoria, [])
+
+def filtro_por_tag(categoria: str, nome: str):
+    # Condição para Fan.id que usa os índices de tags e fan_tags
+    fans_com_tag = select(fan_tags.c.fan_id).join(
+        Tag, Tag.id == fan_tags.c.tag_id
+    ).where(
+        Tag.categoria == categoria,
+        Tag.nome == nome.strip()
+    )
+    return Fan.id.in_(fans_com_tag)
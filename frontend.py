@@ -25,13 +25,19 @@ backend_option = st.sidebar.selectbox(
 API_URL = "https://projetofuria.onrender.com" if backend_option == "Produção" else "http://localhost:8000"
 
 # Funções para consumir a API
-def get_fans(interesse=None, evento=None, compra=None, engajamento=None, page=1, page_size=100, nome=None):
+def get_fans(interesse=None, evento=None, compra=None, engajamento=None, page=1, page_size=100, nome=None, after=None, cursor=False):
     """Obtém a lista de fãs com filtros opcionais"""
     params = {
         "page": page,
         "page_size": page_size
     }
 
+    # Paginação por cursor: cada chamada busca a página seguinte a "after"
+    if cursor or after:
+        params["cursor"] = True
+    if after:
+        params["after"] = after
+
     if interesse:
         params["interesse"] = interesse
     if evento:
@@ -40,22 +46,38 @@ def get_fans(interesse=None, evento=None, compra=None, engajamento=None, page=1,
         params["compra"] = compra
     if engajamento:
         params["engajamento"] = engajamento
+    if nome and nome.strip():
+        # Busca feita pela API (índice de texto), ordenada por relevância
+        params["nome"] = nome.strip()
 
     try:
         response = requests.get(f"{API_URL}/dashboard/fans", params=params)
         response.raise_for_status()
-        data = response.json()
-
-        # Filtrar por nome se fornecido
-        if nome and data["fans"]:
-            data["fans"] = [fan for fan in data["fans"] if nome.lower() in fan["nome"].lower()]
-            data["total"] = len(data["fans"])
-
-        return data
+        return response.json()
     except requests.exceptions.RequestException as e:
         st.error(f"Erro ao obter dados dos fãs: {str(e)}")
         return {"fans": [], "total": 0, "page": 1, "total_pages": 1}
 
+def get_facets(interesse=None, evento=None, compra=None, engajamento=None):
+    """Obtém os valores de cada filtro com a quantidade de fãs"""
+    params = {}
+    if interesse:
+        params["interesse"] = interesse
+    if evento:
+        params["evento"] = evento
+    if compra:
+        params["compra"] = compra
+    if engajamento:
+        params["engajamento"] = engajamento
+
+    try:
+        response = requests.get(f"{API_URL}/dashboard/facets", params=params)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erro ao obter filtros: {str(e)}")
+        return {"interesses": [], "eventos": [], "compras": [], "engajamento": []}
+
 def get_stats():
     """Obtém estatísticas gerais do dashboard"""
     try:
@@ -66,6 +88,8 @@ def get_stats():
         st.error(f"Erro ao obter estatísticas: {str(e)}")
         return {
             "total_fans": 0,
+            "total_redes_validadas": 0,
+            "engajamento": {},
             "top_interesses": [],
             "top_eventos": [],
             "top_compras": []
@@ -155,18 +179,11 @@ if menu == "Dashboard":
     with col1:
         st.metric("Total de Fãs", stats.get("total_fans", 0))
 
-    # Obter dados para as outras métricas
-    fans_data = get_fans(page_size=1000)
-
     with col2:
-        # Calcular fãs com alto engajamento
-        alto_engajamento = sum(1 for fan in fans_data.get("fans", []) if fan.get("engajamento") == "Alto")
-        st.metric("Fãs com Alto Engajamento", alto_engajamento)
+        st.metric("Fãs com Alto Engajamento", stats.get("engajamento", {}).get("Alto", 0))
 
     with col3:
-        # Calcular total de redes validadas
-        total_redes_validadas = sum(fan.get("redes_validadas", 0) for fan in fans_data.get("fans", []))
-        st.metric("Redes Sociais Validadas", total_redes_validadas)
+        st.metric("Redes Sociais Validadas", stats.get("total_redes_validadas", 0))
 
     with col4:
         # Interesse mais popular
@@ -179,18 +196,16 @@ if menu == "Dashboard":
     # Barra de pesquisa
     search_query = st.text_input("🔍 Pesquisar por nome de fã")
 
-    # Extrair todos os dados únicos para os filtros
-    all_fans = fans_data.get("fans", [])
-
-    # Coletar todos os valores únicos
-    all_interesses = set()
-    all_eventos = set()
-    all_compras = set()
-
-    for fan in all_fans:
-        all_interesses.update(fan.get("interesses", []))
-        all_eventos.update(fan.get("eventos", []))
-        all_compras.update(fan.get("compras", []))
+    # Valores disponíveis para os filtros, já restritos aos filtros ativos
+    facetas = get_facets(
+        interesse=st.session_state.get('interesse_filter'),
+        evento=st.session_state.get('evento_filter'),
+        compra=st.session_state.get('compra_filter'),
+        engajamento=st.session_state.get('engajamento_filter')
+    )
+    all_interesses = [item["valor"] for item in facetas.get("interesses", [])]
+    all_eventos = [item["valor"] for item in facetas.get("eventos", [])]
+    all_compras = [item["valor"] for item in facetas.get("compras", [])]
 
     # Criar colunas para os filtros com botões
     col1, col2, col3, col4 = st.columns(4)
@@ -198,7 +213,7 @@ if menu == "Dashboard":
     with col1:
         st.write("**Filtrar por Interesse:**")
         interesse_filter = None
-        interesse_buttons = ["Todos"] + sorted(list(all_interesses))
+        interesse_buttons = ["Todos"] + all_interesses
         for interesse in interesse_buttons:
             if st.button(interesse, key=f"int_{interesse}"):
                 interesse_filter = None if interesse == "Todos" else interesse
@@ -210,7 +225,7 @@ if menu == "Dashboard":
     with col2:
         st.write("**Filtrar por Evento:**")
         evento_filter = None
-        evento_buttons = ["Todos"] + sorted(list(all_eventos))
+        evento_buttons = ["Todos"] + all_eventos
         for evento in evento_buttons[:5]:  # Limitar para não sobrecarregar a UI
             if st.button(evento, key=f"evt_{evento}"):
                 evento_filter = None if evento == "Todos" else evento
@@ -222,7 +237,7 @@ if menu == "Dashboard":
     with col3:
         st.write("**Filtrar por Compra:**")
         compra_filter = None
-        compra_buttons = ["Todos"] + sorted(list(all_compras))
+        compra_buttons = ["Todos"] + all_compras
         for compra in compra_buttons[:5]:  # Limitar para não sobrecarregar a UI
             if st.button(compra, key=f"cmp_{compra}"):
                 compra_filter = None if compra == "Todos" else compra
@@ -250,19 +265,45 @@ if menu == "Dashboard":
         st.session_state.engajamento_filter = None
         st.experimental_rerun()
 
-    # Obter dados filtrados
-    filtered_fans = get_fans(
-        interesse=st.session_state.get('interesse_filter'),
-        evento=st.session_state.get('evento_filter'),
-        compra=st.session_state.get('compra_filter'),
-        engajamento=st.session_state.get('engajamento_filter'),
-        nome=search_query
+    # Obter dados filtrados, página a página (rolagem infinita com cursor)
+    filtros_atuais = (
+        st.session_state.get('interesse_filter'),
+        st.session_state.get('evento_filter'),
+        st.session_state.get('compra_filter'),
+        st.session_state.get('engajamento_filter'),
+        search_query
     )
+    if st.session_state.get('fans_filtros') != filtros_atuais:
+        st.session_state.fans_filtros = filtros_atuais
+        st.session_state.fans_carregados = []
+        st.session_state.fans_cursor = None
+        st.session_state.fans_total = None
+        st.session_state.fans_fim = False
+
+    def carregar_pagina_fans():
+        pagina = get_fans(
+            interesse=st.session_state.get('interesse_filter'),
+            evento=st.session_state.get('evento_filter'),
+            compra=st.session_state.get('compra_filter'),
+            engajamento=st.session_state.get('engajamento_filter'),
+            nome=search_query,
+            after=st.session_state.fans_cursor,
+            cursor=True
+        )
+        st.session_state.fans_carregados.extend(pagina.get("fans", []))
+        st.session_state.fans_cursor = pagina.get("next_cursor")
+        st.session_state.fans_fim = not pagina.get("next_cursor")
+        if pagina.get("total") is not None:
+            st.session_state.fans_total = pagina.get("total")
+
+    if not st.session_state.fans_carregados and not st.session_state.fans_fim:
+        carregar_pagina_fans()
 
     # Tabela de fãs
-    fans_list = filtered_fans.get("fans", [])
+    fans_list = st.session_state.fans_carregados
     if fans_list:
-        st.subheader(f"Fãs ({len(fans_list)})")
+        total_fans = st.session_state.get('fans_total')
+        st.subheader(f"Fãs ({len(fans_list)} de {total_fans})" if total_fans else f"Fãs ({len(fans_list)})")
 
         # Converter para DataFrame para melhor visualização
         fans_df = pd.DataFrame([
@@ -296,6 +337,10 @@ if menu == "Dashboard":
             height=400
         )
 
+        if not st.session_state.fans_fim and st.button("Carregar mais fãs"):
+            carregar_pagina_fans()
+            st.rerun()
+
         # Visualizações
         st.subheader("Visualizações")
 